@@ -0,0 +1,251 @@
+import os
+import re
+import shlex
+import struct
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from docker.models.containers import Container
+
+from generator.manifest import Manifest, NodeRecord
+
+
+"""
+Persistent control channel to the containers of a deployment. Instead of one docker exec per
+action, a single `sh` is attached to each container for the whole run (one exec, one socket) and
+receives batches of commands. Every command of a batch is followed by an end marker carrying
+its exit code, so the replies are streamed back as soon as each command ends :
+      configure   settings of the gossip sequence, written in push_config.toml (read by the gossip
+                  binary) and exported in the shell (inherited by start), then read back
+      shape       bandwidth reduction of the ports (tc on the pcs, ovs-vsctl on the switches)
+      start       ./entrypoint.sh in the background (in its own session when setsid is there)
+      stop        the gossip sequence started before (its whole session)
+      tail_log    new bytes of log.txt since the previous call
+      status      gossip sequence running or not, size of log.txt
+Enabled from the intent with "agent": true, the docker exec per command stays the default.
+"""
+
+SHELL = ["sh"]
+MAX_WORKERS = 32
+READ_TIMEOUT = 60
+APP_DIR = "/app"
+LOG_FILE = f"{APP_DIR}/log.txt"
+CONFIG_FILE = f"{APP_DIR}/push_config.toml"
+PID_FILE = "/tmp/gossip.pid"
+
+# header of the multiplexed stdout/stderr frames of a docker exec without tty : stream, size
+FRAME_HEADER = struct.Struct(">BxxxI")
+
+
+class ContainerAgent:
+      """a shell attached to a container, running batches of commands"""
+
+      def __init__(self, node:NodeRecord, container:Container) -> None:
+            self.node = node
+            self.container = container
+            self.token = uuid.uuid4().hex[:8]
+            self.marker = re.compile(rf"\n__END_{self.token}_(\d+)_(\d+)__\n".encode())
+            self.lock = threading.Lock()
+            self.buffer = b""
+            self.frames = b""
+            self.log_offset = 0
+            api = container.client.api
+            exec_id = api.exec_create(container.id, SHELL, stdin=True, stdout=True, stderr=True, user="root")["Id"]
+            socket = api.exec_start(exec_id, socket=True)
+            # docker returns a wrapper around the socket of the exec
+            self.socket = getattr(socket, "_sock", socket)
+            self.socket.settimeout(READ_TIMEOUT)
+
+      def read(self):
+            """reads one chunk of the exec stream and appends its stdout and stderr to the buffer"""
+            chunk = self.socket.recv(65536)
+            if not chunk:
+                  raise ConnectionError(f"agent of {self.node.name} closed")
+            self.frames += chunk
+            while len(self.frames) >= FRAME_HEADER.size:
+                  _, size = FRAME_HEADER.unpack_from(self.frames)
+                  if len(self.frames) < FRAME_HEADER.size + size:
+                        break
+                  self.buffer += self.frames[FRAME_HEADER.size:FRAME_HEADER.size + size]
+                  self.frames = self.frames[FRAME_HEADER.size + size:]
+
+      def stream(self, commands:list[str]):
+            """sends a batch of commands and yields (index, exit code, output) as each one ends"""
+            with self.lock:
+                  script = "".join(
+                        f"{{ {command}\n}} 2>&1; printf '\\n__END_{self.token}_{i}_%s__\\n' \"$?\"\n"
+                        for i, command in enumerate(commands)
+                  )
+                  self.socket.sendall(script.encode())
+                  for _ in commands:
+                        match = self.marker.search(self.buffer)
+                        while match is None:
+                              self.read()
+                              match = self.marker.search(self.buffer)
+                        output = self.buffer[:match.start()]
+                        self.buffer = self.buffer[match.end():]
+                        yield int(match.group(1)), int(match.group(2)), output
+
+      def run(self, commands:list[str]) -> list[tuple[int, bytes]]:
+            """runs a batch of commands
+
+            :return: (exit code, output) of each command
+            :rtype: list[tuple[int, bytes]]
+            """
+            return [(code, output) for _, code, output in self.stream(commands)]
+
+      def configure(self, environment:dict):
+            """writes the settings in push_config.toml (VAR=value lines, like the gns3 environment
+            of the container) and exports them for the next start"""
+            if not environment:
+                  return []
+            config = "\n".join(f"{key}={value}" for key, value in environment.items())
+            return self.run([
+                  f"cat > {CONFIG_FILE} <<'__CONFIG_{self.token}__'\n{config}\n__CONFIG_{self.token}__",
+                  " ".join(f"export {key}={shlex.quote(str(value))}" for key, value in environment.items()),
+            ])
+
+      def running_config(self) -> dict:
+            """settings of push_config.toml as VAR: value (values kept as they are)"""
+            code, output = self.run([f"cat {CONFIG_FILE}"])[0]
+            if code != 0:
+                  return {}
+            lines = output.decode(errors="ignore").splitlines()
+            return {key.strip(): value.strip() for key, _, value in (line.partition("=") for line in lines) if _}
+
+      def shape(self, commands:list[str]):
+            return self.run(commands)
+
+      def start(self, command:str = "./entrypoint.sh"):
+            return self.run([
+                  f"cd {APP_DIR} && ($(command -v setsid) {command} < /dev/null > /dev/null 2>&1 & echo $! > {PID_FILE})"
+            ])
+
+      def stop(self):
+            """stops the gossip sequence (and its children when it runs in its own session)"""
+            return self.run([f"PID=$(cat {PID_FILE} 2>/dev/null) && (kill -- -$PID 2>/dev/null || kill $PID 2>/dev/null); rm -f {PID_FILE}"])
+
+      def reset_log(self):
+            self.log_offset = 0
+            return self.run([f": > {LOG_FILE}"])
+
+      def tail_log(self) -> bytes:
+            """new bytes of the log since the previous call"""
+            code, output = self.run([f"tail -c +{self.log_offset + 1} {LOG_FILE}"])[0]
+            if code != 0:
+                  return b""
+            self.log_offset += len(output)
+            return output
+
+      def status(self) -> dict:
+            (_, running), (_, size) = self.run([
+                  f"kill -0 $(cat {PID_FILE} 2>/dev/null) 2>/dev/null && echo running || echo stopped",
+                  f"wc -c < {LOG_FILE} 2>/dev/null || echo 0",
+            ])
+            return {"running": running.strip() == b"running", "log_bytes": int(size.strip() or 0)}
+
+      def close(self):
+            try:
+                  self.socket.sendall(b"exit\n")
+                  self.socket.close()
+            except OSError:
+                  pass
+
+
+class AgentPool:
+      """agents of all the containers of a deployment, the batches are sent to all of them concurrently"""
+
+      def __init__(self, manifest:Manifest, nodes:list[tuple[NodeRecord, Container]]) -> None:
+            self.manifest = manifest
+            self.pool = ThreadPoolExecutor(max_workers=max(1, min(MAX_WORKERS, len(nodes))))
+            self.agents:list[ContainerAgent] = []
+            for agent in self.pool.map(lambda item: self.connect(*item), nodes):
+                  if agent is not None:
+                        self.agents.append(agent)
+            print(f"🛰 {len(self.agents)} agents attached")
+
+      @staticmethod
+      def connect(node:NodeRecord, container:Container) -> ContainerAgent | None:
+            try:
+                  return ContainerAgent(node, container)
+            except Exception as e:
+                  print(f"  ⚠️ No agent in {container.name}: {e}")
+                  return None
+
+      def each(self, function, agents:list[ContainerAgent] | None = None) -> list:
+            """calls function(agent) on every agent concurrently, failures are reported and give None"""
+            def call(agent:ContainerAgent):
+                  try:
+                        return function(agent)
+                  except Exception as e:
+                        print(f"  ⚠️ Agent of {agent.node.name} failed: {e}")
+                        return None
+            return list(self.pool.map(call, self.agents if agents is None else agents))
+
+      def pcs(self) -> list[ContainerAgent]:
+            return [agent for agent in self.agents if not agent.node.is_switch]
+
+      def shape(self, bandwidth:float, pc_template:dict, switch_template:dict):
+            """bandwidth reduction of every node in one batch per container (switches : ports in use only)"""
+            def commands(agent:ContainerAgent) -> list[str]:
+                  if agent.node.is_switch:
+                        return [
+                              command for port in sorted(self.manifest.ports_in_use(agent.node))
+                              for command in (switch_template["bw_reduction"][0](port, bandwidth), switch_template["bw_reduction"][1](port))
+                        ]
+                  return [pc_template["bw_reduction"][0](bandwidth), pc_template["bw_reduction"][1](bandwidth)]
+            results = self.each(lambda agent: agent.shape(commands(agent)))
+            failed = sum(1 for result in results if result is None or any(code != 0 for code, _ in result))
+            print(f"  ✅ Bandwidth reduced to {bandwidth} Mbps on {len(results) - failed} nodes ({failed} failed)")
+
+      def configure(self, environment) -> list[str]:
+            """writes the environment (a dict, or a function giving the dict of an agent) on every pc
+            and checks that push_config.toml holds it afterwards
+
+            :return: names of the pcs whose running config differs from the environment
+            :rtype: list[str]
+            """
+            def apply(agent:ContainerAgent) -> bool:
+                  expected = {key: str(value) for key, value in (environment(agent) if callable(environment) else environment).items()}
+                  agent.configure(expected)
+                  running = agent.running_config()
+                  return all(running.get(key) == value for key, value in expected.items())
+            pcs = self.pcs()
+            stale = [agent.node.name for agent, ok in zip(pcs, self.each(apply, pcs)) if not ok]
+            if stale:
+                  print(f"  ⚠️ push_config.toml not updated on {stale}")
+            return stale
+
+      def stop_gossip(self):
+            self.each(lambda agent: agent.stop(), self.pcs())
+
+      def reset_logs(self):
+            self.each(lambda agent: agent.reset_log(), self.pcs())
+
+      def start_gossip(self):
+            """starts the gossip sequence on all pcs, the sender (NODE_IDX = 0) last"""
+            pcs = self.pcs()
+            self.each(lambda agent: agent.start(), [agent for agent in pcs if agent.node.index != 0])
+            self.each(lambda agent: agent.start(), [agent for agent in pcs if agent.node.index == 0])
+            print(f"  ✅ Started gossip on {len(pcs)} pcs")
+
+      def collect_logs(self, dest_dir:str, verbose:bool = True):
+            """appends the new part of the log of every pc to dest_dir/<NODE_IDX>.txt"""
+            def fetch(agent:ContainerAgent):
+                  if agent.log_offset == 0:
+                        open(os.path.join(dest_dir, f"{agent.node.index}.txt"), "wb").close()
+                  new = agent.tail_log()
+                  with open(os.path.join(dest_dir, f"{agent.node.index}.txt"), "ab") as f:
+                        f.write(new)
+                  return len(new)
+            fetched = self.each(fetch, self.pcs())
+            if verbose:
+                  print(f"  ✅ Fetched {sum(size or 0 for size in fetched)} new log bytes from {len(fetched)} pcs")
+
+      def status(self) -> dict[str, dict]:
+            pcs = self.pcs()
+            return {agent.node.name: status for agent, status in zip(pcs, self.each(lambda agent: agent.status(), pcs))}
+
+      def close(self):
+            self.each(lambda agent: agent.close())
+            self.pool.shutdown()
@@ -0,0 +1,153 @@
+import os
+import re
+import json
+import statistics
+from math import sqrt
+
+"""Analysis of the results of an experiment (needs neither gns3 nor docker)"""
+
+# a reception line starts with its timestamp in ms and holds the word block followed by the number
+# of the block, the block file (block_50KB) is not a block number (change it along with the gossip logs)
+LOG_PATTERN = re.compile(r"^\s*\[?(?P<time>\d{13})\]?\s.*?\bblock\s*#?\s*(?P<block>\d+)\b", re.IGNORECASE)
+# lines of a log.txt with the block each one is about (None when it is not a reception), checked by check_log_pattern
+LOG_EXCERPT = [
+      ("1712345678001 loaded block_50KB (51200 bytes)", None),
+      ("1712345678101 generated block 0", 0),
+      ("1712345678102 sent block 0 to 172.19.0.102", 0),
+      ("1712345678157 received block 0 from 172.19.0.101", 0),
+      ("1712345679342 received block 12 from 172.19.0.103 (block_50KB)", 12),
+      ("listening on 0.0.0.0:8301 with block_500KB", None),
+]
+
+METRICS_FILE = "metrics.json"
+
+# two sided 95% quantiles of the student distribution for 1 to 30 degrees of freedom
+T_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+        2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+        2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+def analyze(data, dest_dir) -> dict:
+      """computes the main metrics of an experiment from its logs and stores them in dest_dir/metrics.json,
+      the plots of useless.fetch_data are made too when it is available
+
+      :return: the metrics (empty when no reception was found in the logs)
+      :rtype: dict
+      """
+      metrics = experiment_metrics(dest_dir)
+      with open(os.path.join(dest_dir, METRICS_FILE), "w") as f:
+            json.dump({"intent": data, "metrics": metrics}, f, indent=6, default=str)
+      if metrics:
+            print("📊 " + ", ".join(f"{name} = {value:.3f}" for name, value in metrics.items()))
+      else:
+            print(f"⚠️ No block reception found in the logs of {dest_dir}")
+      try:
+            from useless.fetch_data import fetch_data
+      except ImportError:
+            return metrics
+      fetch_data(data)
+      return metrics
+
+
+def read_receptions(dest_dir:str) -> dict[int, dict[int, float]]:
+      """first time (ms) each node saw each block, from the logs <NODE_IDX>.txt of an experiment
+
+      :return: {block: {node_idx: time}}
+      :rtype: dict[int, dict[int, float]]
+      """
+      receptions:dict[int, dict[int, float]] = {}
+      for file_name in os.listdir(dest_dir):
+            if not re.fullmatch(r"\d+\.txt", file_name):
+                  continue
+            node_idx = int(file_name[:-4])
+            with open(os.path.join(dest_dir, file_name), "r", errors="ignore") as f:
+                  for line in f:
+                        match = LOG_PATTERN.search(line)
+                        if not match:
+                              continue
+                        block, time = int(match.group("block")), float(match.group("time"))
+                        seen = receptions.setdefault(block, {})
+                        if node_idx not in seen or time < seen[node_idx]:
+                              seen[node_idx] = time
+      return receptions
+
+
+def experiment_metrics(dest_dir:str) -> dict:
+      """main metrics of an experiment :
+            - median_latency_ms : median over blocks and receiving nodes of the delay between the first 
+                                  (the origin of the block, not counted) and the node reception of a block
+            - completion_s      : time between the first and the last reception of all blocks
+            - coverage          : share of (node, block) receptions among all the possible ones
+      """
+      receptions = read_receptions(dest_dir)
+      if not receptions:
+            return {}
+      nodes = {node for seen in receptions.values() for node in seen}
+      latencies = []
+      for seen in receptions.values():
+            origin = min(seen, key=seen.get)
+            latencies += [time - seen[origin] for node, time in seen.items() if node != origin]
+      times = [time for seen in receptions.values() for time in seen.values()]
+      metrics = {
+            "completion_s": (max(times) - min(times)) / 1000,
+            "coverage": len(times) / (len(nodes) * len(receptions)),
+      }
+      if latencies:
+            metrics["median_latency_ms"] = statistics.median(latencies)
+      return metrics
+
+
+def confidence_interval(values:list[float]) -> tuple[float, float]:
+      """mean and half width of the 95% confidence interval of the mean
+
+      :return: (mean, half width), the half width is infinite with less than 2 values
+      :rtype: tuple[float, float]
+      """
+      mean = statistics.fmean(values)
+      if len(values) < 2:
+            return mean, float("inf")
+      df = len(values) - 1
+      t = T_95[df - 1] if df <= len(T_95) else 1.96
+      return mean, t * statistics.stdev(values) / sqrt(len(values))
+
+
+def summarize(runs:list[dict], metrics:list[str]) -> dict:
+      """confidence interval of each metric over the repetitions of a configuration"""
+      summary = {}
+      for metric in metrics:
+            values = [run[metric] for run in runs if metric in run]
+            if values:
+                  mean, half_width = confidence_interval(values)
+                  summary[metric] = {"mean": mean, "half_width": half_width, "n": len(values)}
+      return summary
+
+
+def is_precise(summary:dict, metrics:list[str], relative_precision:float) -> bool:
+      """True when the half width of every metric is within relative_precision of its mean"""
+      return all(
+            metric in summary and summary[metric]["half_width"] <= relative_precision * abs(summary[metric]["mean"])
+            for metric in metrics
+      )
+
+
+def check_log_pattern():
+      """LOG_PATTERN against LOG_EXCERPT, receptions are parsed and the block file is never a block"""
+      for line, block in LOG_EXCERPT:
+            match = LOG_PATTERN.search(line)
+            parsed = int(match.group("block")) if match else None
+            assert parsed == block, f"{line!r} : block {parsed} parsed instead of {block}"
+      print(f"✅ LOG_PATTERN parses the {len(LOG_EXCERPT)} lines of LOG_EXCERPT")
+
+
+def changed_metrics(summary:dict, previous:dict) -> list[str]:
+      """metrics whose confidence interval does not overlap with the one of a previous campaign"""
+      changed = []
+      for metric, current in summary.items():
+            old = previous.get(metric)
+            if old and abs(current["mean"] - old["mean"]) > current["half_width"] + old["half_width"]:
+                  changed.append(metric)
+      return changed
+
+
+if __name__ == "__main__":
+      check_log_pattern()
@@ -1,6 +1,10 @@
-from gns3fy import Gns3Connector, Project
-from generator import *
-from load_simulation import *
+import os
+import json
+import itertools
+from generator import TopologyType
+from generator.plan import block_size_bytes, FILTERED_MESHES
+from analysis import experiment_metrics, summarize, is_precise, changed_metrics
+from doe import Factor, SweepPlanner
 
 
 
@@ -11,9 +15,9 @@ from load_simulation import *
 Experiment configurations : 
       - mesh selection  : fullmesh, bus, clustered
       - protocols       : TCP, UDP
-      - block size      : 50KB, ...                   (not implemented yet)
-      - bandwidth       : 50Mbps, 100Mbps             (not implemented yet)
-      - filters         : delay, corrupt rate, ...    (not implemented yet)
+      - block size      : 50KB, ... any size          (blocks are pushed from the local cache)
+      - bandwidth       : 50Mbps, 100Mbps             (shaping of every port)
+      - filters         : delay, corrupt rate, ...    (gns3 filters of the delayed switch links)
 """
 
 SWITCH_TEMPLATE_NAME = "Open vSwitch"
@@ -37,6 +41,30 @@ mesh_info = {
 protocol_list = ["UDP", "TCP"]
 blocks_list = ["block_50KB", "block_100KB", "block_500KB", "block_1000KB", "block_5000KB"]
 bandwidth = [50, 100]
+# block and bandwidth of the full campaigns (the adaptive campaigns sweep blocks_list and bandwidth)
+base_blocks = blocks_list[:1]
+base_bandwidth = bandwidth[-1:]
+# {name: gns3 filters} of the delayed links, empty for the random delay of the generator
+link_filters = {}
+# settings shared by all the configurations
+BASE_INTENT = {
+      "ip_range": "172.19.0.100/24",
+      "max_block": 20,
+      "block_gen_time": 1000,
+      "f_out": 3,
+}
+
+# repetitions of a configuration : at least MIN_REPETITIONS, then until the 95% confidence 
+# interval of every main metric is within RELATIVE_PRECISION of its mean, at most MAX_REPETITIONS
+REPETITIONS = 5
+MIN_REPETITIONS = 3
+MAX_REPETITIONS = 10
+RELATIVE_PRECISION = 0.05
+MAIN_METRICS = ["median_latency_ms", "completion_s"]
+CAMPAIGN_FILE = "json/campaign.json"
+# adaptive campaigns : configurations of the latin hypercube, then total number of configurations
+INITIAL_CONFIGURATIONS = 8
+CONFIGURATION_BUDGET = 24
 
 """
 Generate some intent base from the parameters : 
@@ -51,31 +79,181 @@ Generate some intent base from the parameters :
       }
 """
 
-def iterate_through_intents(mesh_info, protocol_list, block_list=blocks_list, bamdwidth=bandwidth, filters={}):
+def sweep_factors(mesh_info, protocol_list, block_list=blocks_list, bandwidth_list=bandwidth, filters=link_filters) -> list[Factor]:
+      """factors of the configuration space : topology (sizes ordered by number of pcs within each mesh), 
+      protocol, block, bandwidth and link filters (only when some are given)"""
+      topologies = sorted(
+            ((mesh, size) for mesh, sizes in mesh_info.items() for size in sizes.values()),
+            key=lambda topology: (list(mesh_info).index(topology[0]), topology[1][1], topology[1][0]),
+      )
+      factors = [
+            Factor("topology", topologies, groups=[mesh for mesh, _ in topologies]),
+            Factor("protocol", list(protocol_list), ordered=False),
+            Factor("block_name", sorted(block_list, key=block_size_bytes)),
+            Factor("bandwidth_mbps", sorted(bandwidth_list)),
+      ]
+      # the filters only change the meshes with filtered links
+      if filters and any(mesh in FILTERED_MESHES for mesh in mesh_info):
+            factors.append(Factor("link_filter", list(filters.values()), ordered=False))
+      return factors
+
+
+def configuration_intent(levels:dict) -> dict:
+      """intent of a configuration from the level of each factor ({factor name: level})"""
+      mesh, (nb_switch, nb_pc) = levels["topology"]
+      intent = {
+            **BASE_INTENT,
+            SWITCH_TEMPLATE_NAME: nb_switch,
+            PC_TEMPLATE_NAME: nb_pc,
+            "mesh": mesh,
+      }
+      intent.update({name: level for name, level in levels.items() if name != "topology"})
+      if mesh not in FILTERED_MESHES:
+            intent.pop("link_filter", None)
+      return intent
+
+
+def iterate_through_configurations(mesh_info, protocol_list, block_list=base_blocks, bandwidth_list=base_bandwidth, filters=link_filters):
+      """
+      generate through the entire settings to get a generator of all the configurations (once each), 
+      the full product of all the axes : keep the lists short (see run_adaptive_campaign otherwise)
+      """
+      factors = sweep_factors(mesh_info, protocol_list, block_list, bandwidth_list, filters)
+      seen = set()
+      for levels in itertools.product(*(factor.levels for factor in factors)):
+            intent = configuration_intent({factor.name: level for factor, level in zip(factors, levels)})
+            # the link filters give the same configuration on the meshes without filtered links
+            if configuration_key(intent) not in seen:
+                  seen.add(configuration_key(intent))
+                  yield intent
+
+
+def iterate_through_intents(mesh_info, protocol_list, block_list=base_blocks, bandwidth_list=base_bandwidth, filters=link_filters, repetitions=REPETITIONS):
       """
       generate through the entire settings to get a generator of the list of all the experiments
       """
-      for mesh_type, mesh_value in mesh_info.items():
-            for _, size_value in mesh_value.items():
-                  for protocol in protocol_list:
-                        nb_switch = size_value[0]
-                        nb_pc = size_value[1]
-                        for i in range(5):
-                              yield {
-                                    SWITCH_TEMPLATE_NAME: nb_switch,
-                                    PC_TEMPLATE_NAME: nb_pc,
-                                    "ip_range": "172.19.0.100/24",
-                                    "protocol": protocol,
-                                    "mesh": mesh_type,
-                              }
-
-
-# Connect to GNS3 server
-server = Gns3Connector(url="http://localhost:3080")
+      for experiment in iterate_through_configurations(mesh_info, protocol_list, block_list, bandwidth_list, filters):
+            for i in range(repetitions):
+                  yield dict(experiment)
+
+
+def configuration_key(experiment:dict) -> str:
+      """key of a configuration in the campaign file"""
+      mesh = getattr(experiment.get("mesh"), "value", experiment.get("mesh"))
+      return "-".join(str(part) for part in (
+            mesh, experiment[SWITCH_TEMPLATE_NAME], experiment[PC_TEMPLATE_NAME], experiment.get("protocol"),
+            experiment.get("block_name"), experiment.get("bandwidth_mbps"),
+      ) + ((json.dumps(experiment["link_filter"], sort_keys=True),) if experiment.get("link_filter") else ()))
+
+
+def run_with_adaptive_repetitions(name, experiment, run_experiment, min_repetitions=MIN_REPETITIONS,
+                                  max_repetitions=MAX_REPETITIONS, relative_precision=RELATIVE_PRECISION) -> dict:
+      """repeats an experiment until its main metrics are precise enough (or max_repetitions is reached)
+
+      :param run_experiment: function running one experiment, returns the directory of its results
+      :type run_experiment: Callable[[str, dict], str]
+      :return: confidence interval of each main metric
+      :rtype: dict
+      """
+      runs = []
+      summary = {}
+      while len(runs) < max_repetitions:
+            dest_dir = run_experiment(name, dict(experiment))
+            runs.append(experiment_metrics(dest_dir))
+            summary = summarize(runs, MAIN_METRICS)
+            print(f"📊 Repetition {len(runs)} : " + ", ".join(
+                  f"{metric} = {value['mean']:.2f} ± {value['half_width']:.2f}" for metric, value in summary.items()
+            ))
+            if len(runs) >= min_repetitions and is_precise(summary, MAIN_METRICS, relative_precision):
+                  break
+            # a metric missing from every run will never get precise, more repetitions would not help
+            missing = [metric for metric in MAIN_METRICS if metric not in summary]
+            if len(runs) >= min_repetitions and missing:
+                  print(f"⚠️ No {missing} in the logs of {name} after {len(runs)} repetitions, "
+                        f"stopping (check the log format against analysis.LOG_PATTERN)")
+                  break
+      return summary
+
+
+def load_campaign(campaign_file:str) -> dict:
+      if os.path.exists(campaign_file):
+            with open(campaign_file, "r") as f:
+                  return json.load(f)
+      return {}
+
+
+def record_configuration(key:str, summary:dict, previous:dict, results:dict, campaign_file:str) -> dict:
+      """flags the metrics that changed from the previous campaign and updates campaign_file"""
+      changed = changed_metrics(summary, previous.get(key, {}).get("summary", {}))
+      if changed:
+            print(f"⚠️ {key} changed since the previous campaign : {changed}")
+      results[key] = {"summary": summary, "changed": changed}
+      with open(campaign_file, "w") as f:
+            json.dump(results, f, indent=6)
+      return results[key]
+
+
+def run_campaign(name, experiments, run_experiment, campaign_file=CAMPAIGN_FILE) -> dict:
+      """runs every configuration with adaptive repetitions and flags the configurations whose 
+      metrics changed from the previous campaign stored in campaign_file (updated as it goes)
+
+      :return: {configuration key: {"summary", "changed"}}
+      :rtype: dict
+      """
+      previous = load_campaign(campaign_file)
+      results = dict(previous)
+      campaign = {}
+      for experiment in experiments:
+            key = configuration_key(experiment)
+            summary = run_with_adaptive_repetitions(name, experiment, run_experiment)
+            campaign[key] = record_configuration(key, summary, previous, results, campaign_file)
+      return campaign
+
+
+def run_adaptive_campaign(name, factors:list[Factor], run_experiment, initial=INITIAL_CONFIGURATIONS,
+                          budget=CONFIGURATION_BUDGET, campaign_file=CAMPAIGN_FILE, seed=None) -> dict:
+      """runs a latin hypercube sample of the configurations, then the configurations chosen by the 
+      sweep planner where the metrics change the fastest or are the least certain, until budget 
+      configurations are measured (each one with adaptive repetitions)
+
+      :param factors: factors of the configuration space (see sweep_factors)
+      :type factors: list[Factor]
+      :return: {configuration key: {"summary", "changed"}}
+      :rtype: dict
+      """
+      planner = SweepPlanner(factors, MAIN_METRICS, seed)
+      budget = min(budget, planner.size())
+      print(f"🧪 Adaptive campaign : {budget} of {planner.size()} configurations")
+      previous = load_campaign(campaign_file)
+      results = dict(previous)
+      campaign = {}
+      queue = planner.initial(min(initial, budget))
+      while len(campaign) < budget:
+            if not queue:
+                  queue = planner.suggest(1)
+                  if not queue:
+                        break
+            point = queue.pop(0)
+            experiment = configuration_intent(planner.levels(point))
+            key = configuration_key(experiment)
+            if key in campaign:
+                  # same configuration as a measured point (link filter of a mesh without filtered links)
+                  planner.add(point, campaign[key]["summary"])
+                  continue
+            print(f"🔎 Configuration {len(campaign) + 1}/{budget} : {key}")
+            summary = run_with_adaptive_repetitions(name, experiment, run_experiment)
+            planner.add(point, summary)
+            campaign[key] = record_configuration(key, summary, previous, results, campaign_file)
+      return campaign
+
 
 def full_automation(mesh_info, protocol_list):
       """ run the full experimentation of all the experiments """
+      from gns3fy import Gns3Connector, Project
+      from load_simulation import run_experiment
 
+      # Connect to GNS3 server
+      server = Gns3Connector(url="http://localhost:3080")
       project = Project(
             name="my_empty_project",
             connector=server
@@ -85,8 +263,18 @@ def full_automation(mesh_info, protocol_list):
       project.get()          
 
       print("Project created:", project.project_id)
-      for experiment in iterate_through_intents(mesh_info, protocol_list):
-            run_experiment("project_gossip", experiment)
+      run_campaign("project_gossip", iterate_through_configurations(mesh_info, protocol_list), run_experiment)
       project.close()
 
+def pipelined_automation(mesh_info, protocol_list):
+      """ run all the experiments with fixed repetitions, building the next topology while the current one runs """
+      from pipeline import ExperimentPipeline
+      return ExperimentPipeline("project_gossip").run(iterate_through_intents(mesh_info, protocol_list))
+
+def adaptive_automation(mesh_info, protocol_list):
+      """ run a fraction of the configurations, chosen where the metrics vary the most """
+      from load_simulation import run_experiment
+      factors = sweep_factors(mesh_info, protocol_list, blocks_list, bandwidth, link_filters)
+      return run_adaptive_campaign("project_gossip", factors, run_experiment)
+
 # full_automation(mesh_info, protocol_list)
\ No newline at end of file
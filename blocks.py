@@ -0,0 +1,104 @@
+import io
+import os
+import json
+import random
+import hashlib
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
+from docker.models.containers import Container
+
+from generator.manifest import NodeRecord
+from generator.plan import block_size_bytes
+
+
+"""
+Local cache of block payloads : a block of any size (block_<n>KB, block_<n>MB, ...) is generated
+once, stored under its sha256 and pushed in parallel into the running gossip containers whose
+file of that name is missing or has another sha256 (a block baked in the image is only kept when
+it is the same content). Block sizes can be swept without rebuilding the image. Opt-in from the
+intent :
+      "block_cache": true
+"""
+
+BLOCK_CACHE_DIR = os.path.expanduser("~/.cache/gossip_blocks")
+BLOCK_DIR = "/app"
+
+
+def cached_block(block_name:str, cache_dir:str = BLOCK_CACHE_DIR) -> tuple[str, str]:
+      """gets a block payload from the cache, generates it on the first request
+
+      :param block_name: name of the block file (its size is read from it)
+      :type block_name: str
+      :return: (sha256 of the payload, path of the payload in the cache)
+      :rtype: tuple[str, str]
+      """
+      os.makedirs(cache_dir, exist_ok=True)
+      index_path = os.path.join(cache_dir, "index.json")
+      index = {}
+      if os.path.exists(index_path):
+            with open(index_path, "r") as f:
+                  index = json.load(f)
+
+      digest = index.get(block_name)
+      if digest and os.path.exists(os.path.join(cache_dir, digest)):
+            return digest, os.path.join(cache_dir, digest)
+
+      size = block_size_bytes(block_name)
+      if size <= 0:
+            raise ValueError(f"no size in block name {block_name}")
+      # same content for the same size so the hash of a block never changes
+      payload = random.Random(size).randbytes(size)
+      digest = hashlib.sha256(payload).hexdigest()
+      with open(os.path.join(cache_dir, digest), "wb") as f:
+            f.write(payload)
+      index[block_name] = digest
+      with open(index_path, "w") as f:
+            json.dump(index, f, indent=6)
+      print(f"  ✅ Generated {block_name} ({size} bytes) in cache")
+      return digest, os.path.join(cache_dir, digest)
+
+
+def block_archive(block_name:str, path:str) -> bytes:
+      """tar archive (as expected by docker put_archive) holding the block under its name"""
+      buffer = io.BytesIO()
+      with tarfile.open(fileobj=buffer, mode="w") as tar:
+            tar.add(path, arcname=block_name)
+      return buffer.getvalue()
+
+
+def push_block(nodes:list[tuple[NodeRecord, Container]], block_name:str, block_dir:str = BLOCK_DIR) -> int:
+      """pushes a block into every gossip container where it is missing or different (sha256 of the
+      file in the container against the cache), a block name without a size is reported and left
+      to the image
+
+      :param nodes: running nodes of the deployment with their container
+      :type nodes: list[tuple[NodeRecord, Container]]
+      :param block_name: name of the block file
+      :type block_name: str
+      :param block_dir: directory of the block files in the containers, defaults to /app
+      :type block_dir: str, optional
+      :return: number of containers where the block was copied
+      :rtype: int
+      """
+      try:
+            digest, path = cached_block(block_name)
+      except ValueError as e:
+            print(f"  ⚠️ {e}, the containers keep the {block_name} of their image")
+            return 0
+      pcs = [container for node, container in nodes if not node.is_switch]
+
+      def check(container:Container):
+            result = container.exec_run(f"sha256sum {block_dir}/{block_name}", user="root")
+            return result.exit_code != 0 or result.output.decode(errors="ignore").split(" ")[0] != digest
+
+      with ThreadPoolExecutor(max_workers=16) as pool:
+            to_push = [container for container, missing in zip(pcs, pool.map(check, pcs)) if missing]
+            if to_push:
+                  archive = block_archive(block_name, path)
+                  pushed = list(pool.map(lambda container: container.put_archive(block_dir, archive), to_push))
+                  failed = [container.name for container, ok in zip(to_push, pushed) if not ok]
+                  if failed:
+                        print(f"  ⚠️ Failed to push {block_name} in {failed}")
+
+      print(f"  ✅ {block_name} pushed in {len(to_push)}/{len(pcs)} containers")
+      return len(to_push)
@@ -0,0 +1,181 @@
+import os
+import json
+import random
+import struct
+import threading
+import requests
+
+from generator.manifest import Manifest, LinkRecord
+from generator.plan import switch_link_loads
+from generator.state import GNS3_URL
+
+
+"""
+Sampled packet capture on the switch links of a deployment. The links are chosen from the
+topology plan (the most loaded links plus a random sample of the others), gns3 captures them
+and their pcap stream is parsed on the fly in bounded memory into per second series :
+packets, bytes, throughput, packet sizes and tcp retransmissions. Enabled from the intent :
+      "capture": {"links": 4, "seed": 0}
+The series are stored with the results (capture/<S_a>-<S_b>.json).
+"""
+
+CAPTURE_DIR = "capture"
+SIZE_BINS = [64, 128, 256, 512, 1024, 1500]
+MAX_FLOWS = 65536
+CHUNK_SIZE = 65536
+
+PCAP_HEADER = struct.Struct("<IHHiIII")
+
+
+def choose_capture_links(manifest:Manifest, count:int, seed=None) -> list[LinkRecord]:
+      """half of the links are the most loaded ones (pc pairs crossing them), the other half a
+      random sample of the remaining switch links"""
+      links = manifest.switch_links()
+      if count >= len(links):
+            return links
+      loads = switch_link_loads(manifest)
+      ranked = sorted(links, key=lambda l: -loads.get((min(l.a, l.b), max(l.a, l.b)), 0))
+      busiest = ranked[:(count + 1) // 2]
+      others = random.Random(seed).sample(ranked[len(busiest):], count - len(busiest))
+      return busiest + others
+
+
+class PcapSeries:
+      """streaming pcap parser : only the current record, the per second buckets and the highest
+      sequence number of each tcp flow (at most MAX_FLOWS) are kept in memory"""
+
+      def __init__(self) -> None:
+            self.buffer = b""
+            self.endian = None
+            self.buckets:dict[int, dict] = {}
+            self.flows:dict[bytes, int] = {}
+
+      def feed(self, chunk:bytes):
+            self.buffer += chunk
+            offset = 0
+            if self.endian is None:
+                  if len(self.buffer) < PCAP_HEADER.size:
+                        return
+                  # micro or nano second magic, written little or big endian
+                  self.endian = "<" if self.buffer[:4] in (b"\xd4\xc3\xb2\xa1", b"\x4d\x3c\xb2\xa1") else ">"
+                  offset = PCAP_HEADER.size
+            header = struct.Struct(self.endian + "IIII")
+            while len(self.buffer) - offset >= header.size:
+                  seconds, fraction, incl_len, orig_len = header.unpack_from(self.buffer, offset)
+                  if len(self.buffer) - offset - header.size < incl_len:
+                        break
+                  start = offset + header.size
+                  self.add_packet(seconds, orig_len, self.buffer[start:start + incl_len])
+                  offset = start + incl_len
+            self.buffer = self.buffer[offset:]
+
+      def bucket(self, second:int) -> dict:
+            if second not in self.buckets:
+                  self.buckets[second] = {
+                        "packets": 0, "bytes": 0, "tcp": 0, "udp": 0, "tcp_retransmissions": 0,
+                        "sizes": [0] * (len(SIZE_BINS) + 1),
+                  }
+            return self.buckets[second]
+
+      def add_packet(self, second:int, size:int, data:bytes):
+            bucket = self.bucket(second)
+            bucket["packets"] += 1
+            bucket["bytes"] += size
+            bucket["sizes"][next((i for i, limit in enumerate(SIZE_BINS) if size <= limit), len(SIZE_BINS))] += 1
+
+            # ethernet (with an optional vlan tag) then ipv4
+            if len(data) < 14:
+                  return
+            ethertype, offset = struct.unpack_from("!H", data, 12)[0], 14
+            if ethertype == 0x8100 and len(data) >= 18:
+                  ethertype, offset = struct.unpack_from("!H", data, 16)[0], 18
+            if ethertype != 0x0800 or len(data) < offset + 20:
+                  return
+            ihl = (data[offset] & 0x0F) * 4
+            total_length = struct.unpack_from("!H", data, offset + 2)[0]
+            protocol = data[offset + 9]
+            addresses = data[offset + 12:offset + 20]
+            transport = offset + ihl
+            if protocol == 17:
+                  bucket["udp"] += 1
+            elif protocol == 6 and len(data) >= transport + 14:
+                  bucket["tcp"] += 1
+                  ports = data[transport:transport + 4]
+                  seq = struct.unpack_from("!I", data, transport + 4)[0]
+                  payload = total_length - ihl - (data[transport + 12] >> 4) * 4
+                  if payload > 0:
+                        self.add_segment(addresses + ports, seq, payload, bucket)
+
+      def add_segment(self, flow:bytes, seq:int, payload:int, bucket:dict):
+            """a segment ending before the highest sequence seen on its flow is a retransmission"""
+            end = (seq + payload) & 0xFFFFFFFF
+            highest = self.flows.get(flow)
+            if highest is not None and (highest - end) & 0xFFFFFFFF < 0x80000000:
+                  bucket["tcp_retransmissions"] += 1
+                  return
+            if highest is None and len(self.flows) >= MAX_FLOWS:
+                  self.flows.pop(next(iter(self.flows)))
+            self.flows[flow] = end
+
+      def series(self) -> list[dict]:
+            return [
+                  {"t": second, **bucket, "throughput_mbps": bucket["bytes"] * 8 / 1e6}
+                  for second, bucket in sorted(self.buckets.items())
+            ]
+
+
+class LinkCapture:
+      """gns3 captures of a sample of links, parsed while the run goes on"""
+
+      def __init__(self, manifest:Manifest, links:list[LinkRecord], url:str = GNS3_URL) -> None:
+            self.manifest = manifest
+            self.links = links
+            self.url = f"{url}/v2/projects/{manifest.meta['project_id']}/links"
+            self.parsers = {link.link_id: PcapSeries() for link in links}
+            self.threads:list[threading.Thread] = []
+
+      def follow(self, link:LinkRecord):
+            """parses the pcap stream of a link until its capture is stopped"""
+            try:
+                  with requests.get(f"{self.url}/{link.link_id}/pcap", stream=True) as response:
+                        response.raise_for_status()
+                        for chunk in response.iter_content(CHUNK_SIZE):
+                              self.parsers[link.link_id].feed(chunk)
+            except Exception as e:
+                  print(f"  ⚠️ Capture stream of {self.manifest.link_name(link)} stopped: {e}")
+
+      def start(self):
+            for link in self.links:
+                  try:
+                        requests.post(f"{self.url}/{link.link_id}/start_capture", json={
+                              "capture_file_name": f"{self.manifest.link_name(link)}.pcap",
+                              "data_link_type": "DLT_EN10MB",
+                        }).raise_for_status()
+                  except Exception as e:
+                        print(f"  ⚠️ Failed to capture {self.manifest.link_name(link)}: {e}")
+                        continue
+                  self.threads.append(threading.Thread(target=self.follow, args=(link,), daemon=True))
+                  self.threads[-1].start()
+            print(f"🦈 Capturing {len(self.threads)} links : {[self.manifest.link_name(link) for link in self.links]}")
+
+      def stop(self, dest_dir:str = ""):
+            """stops the captures and stores the series in dest_dir/capture"""
+            for link in self.links:
+                  try:
+                        requests.post(f"{self.url}/{link.link_id}/stop_capture").raise_for_status()
+                  except Exception as e:
+                        print(f"  ⚠️ Failed to stop the capture of {self.manifest.link_name(link)}: {e}")
+            for thread in self.threads:
+                  thread.join(timeout=10)
+            if not dest_dir:
+                  return
+            os.makedirs(os.path.join(dest_dir, CAPTURE_DIR), exist_ok=True)
+            for link in self.links:
+                  with open(os.path.join(dest_dir, CAPTURE_DIR, f"{self.manifest.link_name(link)}.json"), "w") as f:
+                        json.dump({
+                              "link": self.manifest.link_name(link),
+                              "link_id": link.link_id,
+                              "size_bins": SIZE_BINS,
+                              "series": self.parsers[link.link_id].series(),
+                        }, f)
+            print(f"  ✅ Capture series saved in {os.path.join(dest_dir, CAPTURE_DIR)}")
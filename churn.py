@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+import requests
+
+from generator.manifest import Manifest
+from generator.state import GNS3_URL
+
+
+"""
+Link churn during a gossip run. The timeline comes from the intent :
+      "churn": {
+            "events": [
+                  {"at": 5, "link": ["S3", "S4"], "action": "suspend"},
+                  {"at": 12, "link": ["S3", "S4"], "action": "restore"}
+            ],
+            "flap_rate": 0.2,          random flaps per second over all the switch links (poisson process)
+            "flap_duration": 2,        seconds a flapping link stays suspended
+            "seed": 0
+      }
+Overlapping random flaps of a link are merged into a single longer one. Link ids are resolved from
+the manifest before the run, every change is a single PUT on a kept alive connection scheduled
+from an asyncio loop, the changes of a given link are sent one at a time in the order of the
+timeline. The links still suspended at the end are restored. The planned and actual times of
+each change (seconds after the gossip start) are stored with the results (churn.json).
+"""
+
+CHURN_FILE = "churn.json"
+
+
+def random_flaps(manifest:Manifest, rate:float, flap_duration:float, duration:float, seed=None) -> list[dict]:
+      """suspend/restore events of random link flaps at `rate` flaps per second, a flap starting
+      while its link is still suspended extends the current one"""
+      rng = random.Random(seed)
+      links = manifest.switch_links()
+      events = []
+      # restore event of the last flap of each link
+      restores:dict[tuple[str, str], dict] = {}
+      at = rng.expovariate(rate) if rate > 0 and links else duration
+      while at < duration:
+            link = rng.choice(links)
+            names = (manifest.nodes[link.a].name, manifest.nodes[link.b].name)
+            end = min(at + flap_duration, duration)
+            if names in restores and at <= restores[names]["at"]:
+                  restores[names]["at"] = max(restores[names]["at"], end)
+            else:
+                  restores[names] = {"at": end, "link": list(names), "action": "restore"}
+                  events.append({"at": at, "link": list(names), "action": "suspend"})
+                  events.append(restores[names])
+            at += rng.expovariate(rate)
+      return events
+
+
+def build_timeline(manifest:Manifest, churn:dict, duration:float) -> list[dict]:
+      """events of the intent and random flaps, sorted and resolved to link ids
+
+      :param manifest: manifest of the deployment
+      :type manifest: Manifest
+      :param churn: "churn" entry of the intent
+      :type churn: dict
+      :param duration: length of the run in seconds (random flaps stop there)
+      :type duration: float
+      :return: [{"at", "link", "link_id", "suspend"}, ...]
+      :rtype: list[dict]
+      """
+      events = list(churn.get("events", []))
+      events += random_flaps(manifest, churn.get("flap_rate", 0), churn.get("flap_duration", 1), duration, churn.get("seed"))
+      timeline = []
+      for event in sorted(events, key=lambda e: e["at"]):
+            link = manifest.link_between(*event["link"])
+            if link is None:
+                  print(f"  ⚠️ No link between {event['link']}, event ignored")
+                  continue
+            timeline.append({
+                  "at": float(event["at"]),
+                  "link": event["link"],
+                  "link_id": link.link_id,
+                  "suspend": event["action"] == "suspend",
+            })
+      return timeline
+
+
+class ChurnScheduler:
+      """applies a timeline of link changes in a background asyncio loop"""
+
+      def __init__(self, manifest:Manifest, timeline:list[dict], url:str = GNS3_URL) -> None:
+            self.timeline = timeline
+            self.url = f"{url}/v2/projects/{manifest.meta['project_id']}/links"
+            self.session = requests.Session()
+            self.records:list[dict] = []
+            self.thread:threading.Thread|None = None
+            self.start_time = 0.0
+            # last state sent to each link : True when suspended
+            self.suspended:dict[str, bool] = {}
+            self.names:dict[str, list] = {}
+
+      def put(self, event:dict) -> tuple[float, float, int]:
+            sent = time.monotonic()
+            try:
+                  status = self.session.put(f"{self.url}/{event['link_id']}", json={"suspend": event["suspend"]}).status_code
+            except requests.RequestException:
+                  status = 0
+            return sent, time.monotonic(), status
+
+      def record(self, event:dict, planned:float, sent:float, done:float, status:int):
+            self.suspended[event["link_id"]] = event["suspend"]
+            self.names[event["link_id"]] = event["link"]
+            self.records.append({
+                  "link": event["link"],
+                  "link_id": event["link_id"],
+                  "suspend": event["suspend"],
+                  "planned": planned,
+                  "sent": sent - self.start_time,
+                  "applied": done - self.start_time,
+                  "status": status,
+            })
+
+      async def apply(self, events:list[dict]):
+            """changes of one link, each one is sent once the previous one is answered"""
+            loop = asyncio.get_running_loop()
+            for event in events:
+                  await asyncio.sleep(max(self.start_time + event["at"] - time.monotonic(), 0))
+                  sent, done, status = await loop.run_in_executor(None, self.put, event)
+                  self.record(event, event["at"], sent, done, status)
+
+      async def run(self):
+            per_link:dict[str, list[dict]] = {}
+            for event in sorted(self.timeline, key=lambda e: e["at"]):
+                  per_link.setdefault(event["link_id"], []).append(event)
+            await asyncio.gather(*(self.apply(events) for events in per_link.values()))
+
+      def start(self, start:float):
+            """starts the timeline, times of the events are relative to `start` (time.monotonic())"""
+            self.start_time = start
+            # open the connection beforehand so the first event does not pay for it
+            try:
+                  self.session.get(self.url.split("/v2/")[0] + "/v2/version")
+            except requests.RequestException:
+                  pass
+            self.thread = threading.Thread(target=asyncio.run, args=(self.run(),), daemon=True)
+            self.thread.start()
+            print(f"🔀 Churn : {len(self.timeline)} link changes scheduled")
+
+      def stop(self, dest_dir:str = ""):
+            """waits for the remaining events, restores the links left suspended and stores the
+            records in dest_dir/churn.json"""
+            if self.thread is not None:
+                  self.thread.join()
+            for link_id in [link_id for link_id, suspended in self.suspended.items() if suspended]:
+                  event = {"link": self.names[link_id], "link_id": link_id, "suspend": False}
+                  sent, done, status = self.put(event)
+                  self.record(event, sent - self.start_time, sent, done, status)
+                  print(f"  🔗 Link {'-'.join(event['link'])} restored at the end of the run")
+            if dest_dir:
+                  with open(os.path.join(dest_dir, CHURN_FILE), "w") as f:
+                        json.dump(sorted(self.records, key=lambda r: r["planned"]), f, indent=6)
+            late = [r["sent"] - r["planned"] for r in self.records]
+            if late:
+                  print(f"  ✅ {len(late)} link changes applied, max lateness {max(late) * 1000:.1f} ms")
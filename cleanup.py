@@ -1,55 +1,78 @@
-import time
-from gns3fy import Gns3Connector, Project
+import os
+from gns3fy import Gns3Connector, Project, Link, Node
 
-FILENAME = "testing"
-
-def safe_cleanup_project(project):
-      """ cleanup the full GNS3 project : remove all the nodes and links """
-
-      print(f"🔹 Cleaning up project: {project.name}")
+from generator.manifest import Manifest, manifest_path
+from generator.state import ProjectState
 
-      # Fetch latest data
-      project.get()
-      project.get_nodes()
-      project.get_links()
+FILENAME = "testing"
+CLEANUP_TIMEOUT = 60
 
-      # Delete all links first
-      print(f"Deleting {len(project.links)} links...")
-      for link in project.links:
+def delete_links_and_nodes(project, node_ids:dict[str, str], link_ids:list[str]):
+      """deletes the links then the nodes ({node_id: name}) of the project"""
+      print(f"Deleting {len(link_ids)} links...")
+      for link_id in link_ids:
             try:
-                  link.delete()
-                  print(f"  ✅ Deleted link {link.link_id}")
-                  time.sleep(0.2)
+                  Link(link_id=link_id, project_id=project.project_id, connector=project.connector).delete()
+                  print(f"  ✅ Deleted link {link_id}")
             except Exception as e:
-                  print(f"  ⚠️ Failed to delete link {link.link_id}: {e}")
+                  print(f"  ⚠️ Failed to delete link {link_id}: {e}")
 
-            # Stop project before node deletion
-            try:
-                  project.stop()
-                  print("⏹ Project stopped.")
-            except Exception:
-                  print("⚠️ Project was not running or already stopped.")
-                  time.sleep(0.5)
-
-      # Delete all nodes
-      print(f"Deleting {len(project.nodes)} nodes...")
-      for node in project.nodes:
+      try:
+            project.stop()
+            print("⏹ Project stopped.")
+      except Exception:
+            print("⚠️ Project was not running or already stopped.")
+
+      print(f"Deleting {len(node_ids)} nodes...")
+      for node_id, name in node_ids.items():
             try:
-                  node.delete()
-                  print(f"  ✅ Deleted node {node.name}")
-                  time.sleep(0.5)
+                  Node(node_id=node_id, project_id=project.project_id, connector=project.connector).delete()
+                  print(f"  ✅ Deleted node {name}")
             except Exception as e:
-                  print(f"  ⚠️ Failed to delete node {node.name}: {e}")
+                  print(f"  ⚠️ Failed to delete node {name}: {e}")
+
+
+def safe_cleanup_project(project, state:ProjectState):
+      """ cleanup the full GNS3 project : remove all the nodes and links of its mirror """
+
+      print(f"🔹 Cleaning up project: {project.name}")
+      with state.changed:
+            node_ids = {node_id: node.get("name", node_id) for node_id, node in state.nodes.items()}
+            link_ids = list(state.links)
+      delete_links_and_nodes(project, node_ids, link_ids)
+      # the deletions are over once gns3 has notified all of them
+      if not state.wait_removed(timeout=CLEANUP_TIMEOUT):
+            print(f"⚠️ {len(state.nodes)} nodes and {len(state.links)} links still in the project")
+      print("🧹 Cleanup complete!")
+
+
+def cleanup_from_manifest(project, manifest:Manifest, state:ProjectState|None = None):
+      """ cleanup the nodes and links listed in the manifest of the deployment without 
+      fetching the whole project again """
 
+      print(f"🔹 Cleaning up project from manifest: {project.name}")
+      node_ids = {record.node_id: record.name for record in manifest.nodes}
+      link_ids = [record.link_id for record in manifest.links]
+      delete_links_and_nodes(project, node_ids, link_ids)
+      if state is not None and not state.wait_removed(node_ids, link_ids, CLEANUP_TIMEOUT):
+            print("⚠️ Some nodes or links of the manifest are still in the project")
       print("🧹 Cleanup complete!")
 
 
 def full_cleanup(name):
-      """cleanup + connection"""
+      """cleanup + connection, uses the manifest of the last deployment of the project when 
+      there is one"""
       server = Gns3Connector("http://localhost:3080")
       project = Project(name=name, connector=server)
-      project.get()
-      safe_cleanup_project(project)
+      project.get(get_links=False, get_nodes=False, get_stats=False)
+      path = manifest_path(name)
+      manifest = Manifest.load(path) if os.path.exists(path) else None
+      with ProjectState(project.project_id) as state:
+            if manifest is not None and manifest.meta.get("project_id") == project.project_id:
+                  cleanup_from_manifest(project, manifest, state)
+                  os.remove(path)
+            else:
+                  safe_cleanup_project(project, state)
       return project
 
 
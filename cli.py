@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+import sys
+
+
+"""
+Single entry point of the experiments :
+      python cli.py plan     --mesh bus             plans a topology offline (metrics, run budget, placement)
+      python cli.py deploy   --project NAME         generates the topology on gns3 and writes its manifest
+      python cli.py run      --project NAME         starts the deployment and runs the gossip sequence
+      python cli.py collect  --project NAME DIR     fetches the logs of a running deployment
+      python cli.py analyze  DIR                    computes the metrics of an experiment (DIR/metrics.json)
+      python cli.py cleanup  --project NAME         removes the topology from gns3
+      python cli.py bench    --project NAME         micro benchmark of the transport settings on a minimal topology
+
+Each command only imports what it needs (gns3fy, docker, ...) and connects only when it has to,
+so plan and analyze work offline.
+"""
+
+DEFAULT_INTENT = "json/intent.json"
+DEFAULT_PROJECT = "gossip_project"
+# the benchmark deploys (and so wipes) its own project, not the one of the experiments
+BENCH_PROJECT = "gossip_microbench"
+
+
+def load_intent(args) -> dict:
+      with open(args.intent, "r") as f:
+            data = json.load(f)
+      if args.mesh:
+            data["mesh"] = args.mesh
+      return data
+
+
+def load_manifest(args):
+      from generator import Manifest, manifest_path
+      return Manifest.load(manifest_path(args.project))
+
+
+def cmd_plan(args):
+      from generator import TopologyPlan, TopologyType, planned_manifest, plan_placement
+      from generator.plan import switch_edges
+      from generator.placement import placement_summary
+      data = load_intent(args)
+      mesh = TopologyType(data.get("mesh", TopologyType.FULL_MESH.value))
+      manifest = planned_manifest(mesh, data)
+      plan = TopologyPlan(manifest, data).to_dict()
+      if isinstance(data.get("computes"), list):
+            nb_switch = data["Open vSwitch"]
+            edges = switch_edges(mesh, nb_switch)
+            pcs_per_switch = [data["gossiptcpudp"] // nb_switch] * nb_switch
+            placement = plan_placement(nb_switch, edges, pcs_per_switch, data["computes"])
+            plan["placement"] = placement_summary(edges, pcs_per_switch, placement)
+      print(json.dumps(plan, indent=6))
+
+
+def cmd_deploy(args):
+      from load_simulation import deploy
+      manifest = deploy(args.project, load_intent(args))
+      print(f"✅ {len(manifest.nodes)} nodes and {len(manifest.links)} links deployed in {args.project}")
+
+
+def cmd_run(args):
+      from load_simulation import new_experience, start_nodes, run_deployment
+      manifest = load_manifest(args)
+      dest_dir = new_experience("full_mesh")
+      manifest.dump(os.path.join(dest_dir, "topology.manifest"))
+      start_nodes(manifest)
+      run_deployment(manifest, manifest.meta["intent"], dest_dir)
+
+
+def cmd_collect(args):
+      from load_simulation import project_containers, collect_logs
+      os.makedirs(args.dest_dir, exist_ok=True)
+      collect_logs(project_containers(load_manifest(args)), args.dest_dir)
+
+
+def cmd_analyze(args):
+      from generator import Manifest
+      from analysis import analyze
+      manifest = Manifest.load(os.path.join(args.dest_dir, "topology.manifest"))
+      analyze(manifest.meta["intent"], args.dest_dir)
+
+
+def cmd_cleanup(args):
+      from cleanup import full_cleanup
+      full_cleanup(args.project)
+
+
+def cmd_bench(args):
+      from microbench import MicroBenchmark
+      MicroBenchmark(args.project, load_intent(args)).run()
+
+
+def build_parser() -> argparse.ArgumentParser:
+      parser = argparse.ArgumentParser(description="gossip experiments on gns3")
+      commands = parser.add_subparsers(dest="command", required=True)
+
+      plan = commands.add_parser("plan", help="plan a topology offline")
+      plan.add_argument("--intent", default=DEFAULT_INTENT)
+      plan.add_argument("--mesh", help="fullmesh, bus, clustered2, clustered3")
+      plan.set_defaults(func=cmd_plan)
+
+      deploy = commands.add_parser("deploy", help="generate the topology on gns3")
+      deploy.add_argument("--intent", default=DEFAULT_INTENT)
+      deploy.add_argument("--mesh", help="fullmesh, bus, clustered2, clustered3")
+      deploy.add_argument("--project", default=DEFAULT_PROJECT)
+      deploy.set_defaults(func=cmd_deploy)
+
+      run = commands.add_parser("run", help="run the gossip sequence on a deployment")
+      run.add_argument("--project", default=DEFAULT_PROJECT)
+      run.set_defaults(func=cmd_run)
+
+      collect = commands.add_parser("collect", help="fetch the logs of a running deployment")
+      collect.add_argument("--project", default=DEFAULT_PROJECT)
+      collect.add_argument("dest_dir")
+      collect.set_defaults(func=cmd_collect)
+
+      analyze = commands.add_parser("analyze", help="analyze the results of an experiment")
+      analyze.add_argument("dest_dir")
+      analyze.set_defaults(func=cmd_analyze)
+
+      cleanup = commands.add_parser("cleanup", help="remove the topology from gns3")
+      cleanup.add_argument("--project", default=DEFAULT_PROJECT)
+      cleanup.set_defaults(func=cmd_cleanup)
+
+      bench = commands.add_parser("bench", help="sweep packet size, protocol, block and bandwidth on a minimal topology")
+      bench.add_argument("--intent", default=DEFAULT_INTENT)
+      bench.add_argument("--project", default=BENCH_PROJECT)
+      bench.set_defaults(func=cmd_bench, mesh=None)
+      return parser
+
+
+def main(argv=None):
+      args = build_parser().parse_args(argv)
+      args.func(args)
+
+
+if __name__ == "__main__":
+      sys.exit(main())
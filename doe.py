@@ -0,0 +1,148 @@
+import random
+import itertools
+from math import sqrt
+from dataclasses import dataclass
+
+"""
+Design of experiments for the campaigns (needs neither gns3 nor docker). Instead of the full
+product of all the factors, a campaign starts from a latin hypercube sample of the configuration
+space, then each next configuration is the candidate with the highest score :
+
+      score = distance to the closest measured configuration
+              * (spread of the metrics among its nearest measured neighbors + uncertainty of these metrics)
+
+The spread is the range of the (normalized) means of each metric among the neighbors : high where
+the metrics change fast. The uncertainty is the relative half width of their confidence interval.
+The distance spreads the runs over the unexplored regions. A configuration is a tuple of level
+indexes, one per factor.
+"""
+
+# candidates scored at each step (the whole space when it is smaller)
+MAX_CANDIDATES = 5000
+NEIGHBORS = 4
+# weight of the distance alone, keeps filling the space when the metrics are flat
+SPACE_FILLING = 0.1
+
+
+@dataclass(slots=True)
+class Factor:
+      """a parameter of the configurations and its levels
+
+      - ordered levels are at distance |i - j| / (number of levels - 1)
+      - unordered levels (e.g. protocols) are at distance 1 of each other
+      - levels of different groups (e.g. sizes of different meshes) are at distance 1
+      """
+      name:str
+      levels:list
+      ordered:bool = True
+      groups:list|None = None
+
+      def group(self, i:int):
+            return self.groups[i] if self.groups else None
+
+      def position(self, i:int) -> float:
+            """position of a level among the levels of its group, in [0, 1]"""
+            same = [j for j in range(len(self.levels)) if self.group(j) == self.group(i)]
+            return same.index(i) / (len(same) - 1) if len(same) > 1 else 0.0
+
+      def distance(self, i:int, j:int) -> float:
+            if i == j:
+                  return 0.0
+            if not self.ordered or self.group(i) != self.group(j):
+                  return 1.0
+            return abs(self.position(i) - self.position(j))
+
+
+def latin_hypercube(factors:list[Factor], n:int, seed=None) -> list[tuple[int, ...]]:
+      """n configurations whose levels are evenly spread over each factor (duplicates removed)"""
+      rng = random.Random(seed)
+      columns = []
+      for factor in factors:
+            strata = list(range(n))
+            rng.shuffle(strata)
+            columns.append([int((stratum + rng.random()) / n * len(factor.levels)) for stratum in strata])
+      return list(dict.fromkeys(zip(*columns)))
+
+
+class SweepPlanner:
+      """chooses the configurations to run from the metrics of the ones already measured"""
+
+      def __init__(self, factors:list[Factor], metrics:list[str], seed=None) -> None:
+            """basic init
+
+            :param factors: factors of the configuration space
+            :type factors: list[Factor]
+            :param metrics: metrics of the summaries (analysis.summarize) driving the choice
+            :type metrics: list[str]
+            """
+            self.factors = factors
+            self.metrics = metrics
+            self.rng = random.Random(seed)
+            self.seed = seed
+            self.measured:dict[tuple[int, ...], dict] = {}
+
+      def size(self) -> int:
+            total = 1
+            for factor in self.factors:
+                  total *= len(factor.levels)
+            return total
+
+      def levels(self, point:tuple[int, ...]) -> dict:
+            """{factor name: level} of a configuration"""
+            return {factor.name: factor.levels[i] for factor, i in zip(self.factors, point)}
+
+      def distance(self, a:tuple[int, ...], b:tuple[int, ...]) -> float:
+            return sqrt(sum(f.distance(i, j) ** 2 for f, i, j in zip(self.factors, a, b)) / len(self.factors))
+
+      def add(self, point:tuple[int, ...], summary:dict):
+            """records the summary ({metric: {"mean", "half_width", "n"}}) of a measured configuration"""
+            self.measured[point] = summary
+
+      def initial(self, n:int) -> list[tuple[int, ...]]:
+            """latin hypercube sample of n configurations (fewer if some coincide)"""
+            return [point for point in latin_hypercube(self.factors, n, self.seed) if point not in self.measured]
+
+      def candidates(self) -> list[tuple[int, ...]]:
+            if self.size() <= MAX_CANDIDATES:
+                  points = itertools.product(*(range(len(f.levels)) for f in self.factors))
+            else:
+                  points = (tuple(self.rng.randrange(len(f.levels)) for f in self.factors) for _ in range(MAX_CANDIDATES))
+            return [point for point in dict.fromkeys(points) if point not in self.measured]
+
+      def metric_ranges(self) -> dict[str, tuple[float, float]]:
+            ranges = {}
+            for metric in self.metrics:
+                  means = [s[metric]["mean"] for s in self.measured.values() if metric in s]
+                  if means:
+                        ranges[metric] = (min(means), (max(means) - min(means)) or 1.0)
+            return ranges
+
+      def local_variation(self, point:tuple[int, ...], ranges:dict) -> float:
+            """spread and uncertainty of the metrics among the nearest measured configurations"""
+            neighbors = sorted(self.measured, key=lambda m: self.distance(point, m))[:NEIGHBORS]
+            variation = 0.0
+            for metric, (low, span) in ranges.items():
+                  summaries = [self.measured[m][metric] for m in neighbors if metric in self.measured[m]]
+                  if not summaries:
+                        continue
+                  means = [(s["mean"] - low) / span for s in summaries]
+                  uncertainty = [min(s["half_width"] / abs(s["mean"]), 1.0) if s["mean"] else 1.0 for s in summaries]
+                  variation += max(means) - min(means) + sum(uncertainty) / len(uncertainty)
+            return variation
+
+      def suggest(self, k:int = 1) -> list[tuple[int, ...]]:
+            """k configurations with the highest scores, each one chosen is considered as measured for
+            the distance of the next ones so that a batch does not pile up in one region"""
+            if not self.measured:
+                  return self.initial(k)[:k]
+            ranges = self.metric_ranges()
+            scored = {point: self.local_variation(point, ranges) + SPACE_FILLING for point in self.candidates()}
+            chosen:list[tuple[int, ...]] = []
+            for _ in range(min(k, len(scored))):
+                  references = list(self.measured) + chosen
+                  best = max(
+                        (point for point in scored if point not in chosen),
+                        key=lambda point: scored[point] * min(self.distance(point, r) for r in references),
+                  )
+                  chosen.append(best)
+            return chosen
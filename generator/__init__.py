@@ -1,3 +1,16 @@
-from .topology_generator import TopologyGenerator
-from .project_generator import ProjectGenerator
-from .topology_generator import TopologyType
\ No newline at end of file
+from .manifest import Manifest, NodeRecord, LinkRecord, manifest_path
+from .plan import TopologyPlan, TopologyType, planned_manifest
+from .placement import plan_placement
+
+# the generators need gns3fy and the state tracker requests, they are only imported when used
+def __getattr__(name):
+      if name == "ProjectState":
+            from .state import ProjectState
+            return ProjectState
+      if name == "TopologyGenerator":
+            from .topology_generator import TopologyGenerator
+            return TopologyGenerator
+      if name == "ProjectGenerator":
+            from .project_generator import ProjectGenerator
+            return ProjectGenerator
+      raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,214 @@
+import json
+import struct
+import zlib
+import ipaddress
+from dataclasses import dataclass, field
+
+
+"""
+Deployment manifest : one typed description of a generated topology shared by
+load_simulation, cleanup and the analysis (nodes, roles, IPs, ports, container
+IDs, links, ports in use and filters).
+
+Binary layout (little endian) :
+      - header    : magic, version, #nodes, #links, size of the string table, size of the meta blob
+      - nodes     : fixed size records, strings are indexes in the string table
+      - links     : fixed size records, endpoints are node rows
+      - strings   : zlib compressed, "\\0" separated
+      - meta      : zlib compressed json (project, intent, ...)
+"""
+
+MAGIC = b"GSMF"
+VERSION = 1
+MANIFEST_DIR = "manifests"
+
+SWITCH = 0
+PC = 1
+NO_ROW = 0xFFFFFFFF
+
+# magic, version, nb_nodes, nb_links, strings_size, meta_size
+HEADER = struct.Struct("<4sHIIII")
+# role, index, name, node_id, switch row, ip, port, container_id, compute_id
+NODE = struct.Struct("<BIIIIIHII")
+# link_id, node a row, port a, node b row, port b, filters
+LINK = struct.Struct("<IIhIhI")
+
+
+@dataclass(slots=True)
+class NodeRecord:
+      """one node of the deployment (switch or pc)"""
+      row:int
+      role:int
+      index:int
+      name:str
+      node_id:str
+      switch:int = NO_ROW
+      ip:str = ""
+      port:int = 0
+      container_id:str = ""
+      compute_id:str = ""
+
+      @property
+      def is_switch(self) -> bool:
+            return self.role == SWITCH
+
+
+@dataclass(slots=True)
+class LinkRecord:
+      """one link of the deployment, endpoints are node rows in the manifest"""
+      link_id:str
+      a:int
+      port_a:int
+      b:int
+      port_b:int
+      filters:dict = field(default_factory=dict)
+
+
+class Manifest:
+      """Indexed view of a deployment"""
+
+      def __init__(self, meta:dict|None = None) -> None:
+            self.nodes:list[NodeRecord] = []
+            self.links:list[LinkRecord] = []
+            self.meta = meta if meta is not None else {}
+            self.by_name:dict[str, NodeRecord] = {}
+            self.by_node_id:dict[str, NodeRecord] = {}
+            self.by_container_id:dict[str, NodeRecord] = {}
+            self.links_by_row:dict[int, list[LinkRecord]] = {}
+
+      ### building
+      def add_node(self, role:int, index:int, name:str, node_id:str, switch:str|None = None,
+                   ip:str = "", port:int = 0, container_id:str = "", compute_id:str = "") -> NodeRecord:
+            """adds a node, the parent switch (for a pc) is given by its name and must already exist
+
+            :return: the record added
+            :rtype: NodeRecord
+            """
+            row = NO_ROW if switch is None else self.by_name[switch].row
+            node = NodeRecord(len(self.nodes), role, index, name, node_id, row, ip, port, container_id, compute_id)
+            self.index_node(node)
+            return node
+
+      def add_link(self, link_id:str, node_a:str, port_a:int, node_b:str, port_b:int, filters:dict|None = None) -> LinkRecord:
+            """adds a link between two nodes given by name
+
+            :return: the record added
+            :rtype: LinkRecord
+            """
+            link = LinkRecord(link_id, self.by_name[node_a].row, port_a, self.by_name[node_b].row, port_b, filters or {})
+            self.index_link(link)
+            return link
+
+      def index_node(self, node:NodeRecord):
+            self.nodes.append(node)
+            self.by_name[node.name] = node
+            self.by_node_id[node.node_id] = node
+            if node.container_id:
+                  self.by_container_id[node.container_id] = node
+
+      def index_link(self, link:LinkRecord):
+            self.links.append(link)
+            self.links_by_row.setdefault(link.a, []).append(link)
+            self.links_by_row.setdefault(link.b, []).append(link)
+
+      ### queries
+      def switches(self) -> list[NodeRecord]:
+            return [node for node in self.nodes if node.role == SWITCH]
+
+      def pcs(self) -> list[NodeRecord]:
+            return [node for node in self.nodes if node.role == PC]
+
+      def pcs_of(self, switch:NodeRecord) -> list[NodeRecord]:
+            return [node for node in self.nodes if node.switch == switch.row]
+
+      def links_of(self, node:NodeRecord) -> list[LinkRecord]:
+            return self.links_by_row.get(node.row, [])
+
+      def ports_in_use(self, node:NodeRecord) -> set[int]:
+            """ports of a node that are connected to a link"""
+            return {link.port_a if link.a == node.row else link.port_b for link in self.links_of(node)}
+
+      def switch_links(self) -> list[LinkRecord]:
+            """links between two switches"""
+            return [link for link in self.links if self.nodes[link.a].is_switch and self.nodes[link.b].is_switch]
+
+      def link_between(self, name_a:str, name_b:str) -> LinkRecord | None:
+            """link between two nodes, None when there is none or a name is unknown"""
+            if name_a not in self.by_name or name_b not in self.by_name:
+                  return None
+            a, b = self.by_name[name_a].row, self.by_name[name_b].row
+            for link in self.links_by_row.get(a, []):
+                  if {link.a, link.b} == {a, b}:
+                        return link
+            return None
+
+      def link_name(self, link:LinkRecord) -> str:
+            """<name of a>-<name of b> of a link (e.g. S3-S4)"""
+            return f"{self.nodes[link.a].name}-{self.nodes[link.b].name}"
+
+      def link_on_port(self, node:NodeRecord, port:int) -> LinkRecord | None:
+            for link in self.links_of(node):
+                  if (link.a == node.row and link.port_a == port) or (link.b == node.row and link.port_b == port):
+                        return link
+            return None
+
+      def container_ids(self) -> list[str]:
+            return [node.container_id for node in self.nodes if node.container_id]
+
+      ### storage
+      def dump(self, path:str):
+            """writes the manifest in its binary format"""
+            strings:dict[str, int] = {}
+            intern = lambda s: strings.setdefault(s, len(strings))
+            intern("")
+
+            nodes = bytearray()
+            for n in self.nodes:
+                  ip = int(ipaddress.IPv4Address(n.ip)) if n.ip else 0
+                  nodes += NODE.pack(n.role, n.index, intern(n.name), intern(n.node_id), n.switch,
+                                     ip, n.port, intern(n.container_id), intern(n.compute_id))
+            links = bytearray()
+            for l in self.links:
+                  filters = json.dumps(l.filters, sort_keys=True) if l.filters else ""
+                  links += LINK.pack(intern(l.link_id), l.a, l.port_a, l.b, l.port_b, intern(filters))
+
+            string_blob = zlib.compress("\0".join(strings).encode())
+            meta_blob = zlib.compress(json.dumps(self.meta, default=lambda o: getattr(o, "value", str(o))).encode())
+            with open(path, "wb") as f:
+                  f.write(HEADER.pack(MAGIC, VERSION, len(self.nodes), len(self.links), len(string_blob), len(meta_blob)))
+                  f.write(nodes)
+                  f.write(links)
+                  f.write(string_blob)
+                  f.write(meta_blob)
+
+      @classmethod
+      def load(cls, path:str) -> "Manifest":
+            """reads a manifest written by dump"""
+            with open(path, "rb") as f:
+                  data = f.read()
+            magic, version, nb_nodes, nb_links, strings_size, meta_size = HEADER.unpack_from(data)
+            if magic != MAGIC or version != VERSION:
+                  raise ValueError(f"{path} is not a manifest (version {VERSION})")
+
+            offset = HEADER.size
+            nodes_end = offset + nb_nodes * NODE.size
+            links_end = nodes_end + nb_links * LINK.size
+            strings = zlib.decompress(data[links_end:links_end + strings_size]).decode().split("\0")
+            meta = json.loads(zlib.decompress(data[links_end + strings_size:links_end + strings_size + meta_size]))
+
+            manifest = cls(meta)
+            for row, (role, index, name, node_id, switch, ip, port, container_id, compute_id) in enumerate(
+                  NODE.iter_unpack(data[offset:nodes_end])):
+                  manifest.index_node(NodeRecord(
+                        row, role, index, strings[name], strings[node_id], switch,
+                        str(ipaddress.IPv4Address(ip)) if ip else "", port, strings[container_id], strings[compute_id]
+                  ))
+            for link_id, a, port_a, b, port_b, filters in LINK.iter_unpack(data[nodes_end:links_end]):
+                  manifest.index_link(LinkRecord(
+                        strings[link_id], a, port_a, b, port_b, json.loads(strings[filters]) if strings[filters] else {}
+                  ))
+            return manifest
+
+
+def manifest_path(project_name:str) -> str:
+      return f"{MANIFEST_DIR}/{project_name}.manifest"
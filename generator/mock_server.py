@@ -0,0 +1,280 @@
+import re
+import json
+import uuid
+import queue
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from .plan import TopologyType, switch_edges
+from .placement import plan_placement
+
+
+"""
+In memory gns3 server answering the urls used by the generators and the state tracker, on a free
+local port :
+      GET  /v2/version, /v2/computes, /v2/templates, /v2/projects, /v2/projects/<id>
+      GET  /v2/projects/<id>/nodes, /links, /notifications (streamed)
+      POST /v2/projects/<id>/templates/<template id>, /links
+      PUT  /v2/projects/<id>/nodes/<node id>, /links/<link id>
+Every created or updated node and link is sent on the notification stream like gns3 does. The
+requests received are recorded so that a check can tell they all went to the mock :
+      with MockGns3Server() as server:
+            TopologyGenerator(TopologyType.BUS, intent, server.project_name, url=server.url)
+Running the module checks the generator against it (python -m generator.mock_server).
+"""
+
+MOCK_PROJECT = "mock_project"
+MOCK_TEMPLATES = ["Open vSwitch", "gossiptcpudp"]
+MOCK_COMPUTES = ["local"]
+NB_PORTS = 16
+PING_INTERVAL = 0.5
+
+
+class MockGns3Server:
+      """a gns3 server with one opened project, nodes and links are only kept in memory"""
+
+      def __init__(self, project_name:str = MOCK_PROJECT, templates:list[str] = MOCK_TEMPLATES,
+                   computes:list[str] = MOCK_COMPUTES) -> None:
+            self.project_name = project_name
+            self.computes = list(computes)
+            self.project_id = str(uuid.uuid4())
+            self.templates = {str(uuid.uuid4()): name for name in templates}
+            self.nodes:dict[str, dict] = {}
+            self.links:dict[str, dict] = {}
+            self.requests:list[tuple[str, str]] = []
+            self.lock = threading.RLock()
+            self.listeners:list[queue.Queue] = []
+            self.closing = threading.Event()
+            self.http = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+            self.http.daemon_threads = True
+            self.url = f"http://127.0.0.1:{self.http.server_port}"
+            self.thread:threading.Thread|None = None
+
+      def __enter__(self):
+            return self.start()
+
+      def __exit__(self, *_):
+            self.stop()
+
+      def start(self):
+            self.thread = threading.Thread(target=self.http.serve_forever, daemon=True)
+            self.thread.start()
+            return self
+
+      def stop(self):
+            self.closing.set()
+            self.http.shutdown()
+            self.http.server_close()
+
+      def notify(self, action:str, event:dict):
+            with self.lock:
+                  for listener in self.listeners:
+                        listener.put({"action": action, "event": event})
+
+      def project(self) -> dict:
+            return {"project_id": self.project_id, "name": self.project_name, "status": "opened"}
+
+      def create_node(self, template_id:str, body:dict) -> dict:
+            node_id = str(uuid.uuid4())
+            node = {
+                  "node_id": node_id,
+                  "project_id": self.project_id,
+                  "name": f"{self.templates[template_id]}-{len(self.nodes)}",
+                  "node_type": "docker",
+                  "compute_id": body.get("compute_id", "local"),
+                  "status": "stopped",
+                  "ports": [
+                        {"name": f"eth{i}", "adapter_number": i, "port_number": 0, "short_name": f"eth{i}", "link_type": "ethernet"}
+                        for i in range(NB_PORTS)
+                  ],
+                  "properties": {"container_id": uuid.uuid4().hex},
+            }
+            self.nodes[node_id] = node
+            self.notify("node.created", node)
+            return node
+
+      def update(self, items:dict[str, dict], item_id:str, body:dict, kind:str) -> dict|None:
+            if item_id not in items:
+                  return None
+            items[item_id].update(body)
+            self.notify(f"{kind}.updated", items[item_id])
+            return items[item_id]
+
+      def create_link(self, body:dict) -> dict:
+            link_id = str(uuid.uuid4())
+            link = {
+                  "link_id": link_id,
+                  "project_id": self.project_id,
+                  "link_type": body.get("link_type", "ethernet"),
+                  "nodes": body.get("nodes", []),
+                  "filters": {},
+                  "suspend": False,
+            }
+            self.links[link_id] = link
+            self.notify("link.created", link)
+            return link
+
+      def route(self, method:str, path:str, body:dict):
+            """answer of a request : (status, json)"""
+            project = f"/v2/projects/{self.project_id}"
+            routes = [
+                  ("GET", r"/v2/version", lambda: {"version": "2.2.0", "local": True}),
+                  ("GET", r"/v2/computes", lambda: [{"compute_id": c, "name": c, "connected": True} for c in self.computes]),
+                  ("GET", r"/v2/templates", lambda: [{"template_id": t, "name": n} for t, n in self.templates.items()]),
+                  ("GET", r"/v2/projects", lambda: [self.project()]),
+                  ("GET", rf"{project}", self.project),
+                  ("GET", rf"{project}/nodes", lambda: list(self.nodes.values())),
+                  ("GET", rf"{project}/links", lambda: list(self.links.values())),
+                  ("POST", rf"{project}/templates/([\w-]+)", lambda t: self.create_node(t, body) if t in self.templates else None),
+                  ("PUT", rf"{project}/nodes/([\w-]+)", lambda n: self.update(self.nodes, n, body, "node")),
+                  ("POST", rf"{project}/links", lambda: self.create_link(body)),
+                  ("PUT", rf"{project}/links/([\w-]+)", lambda l: self.update(self.links, l, body, "link")),
+            ]
+            for route_method, pattern, answer in routes:
+                  match = re.fullmatch(pattern, path)
+                  if route_method == method and match:
+                        with self.lock:
+                              result = answer(*match.groups())
+                        if result is None:
+                              return 404, {"status": 404, "message": f"{path} not found"}
+                        return (201 if method == "POST" else 200), result
+            return 404, {"status": 404, "message": f"{method} {path} not found"}
+
+      def stream(self, handler:BaseHTTPRequestHandler):
+            """notifications of the project, one json per line, until the client or the server closes"""
+            listener:queue.Queue = queue.Queue()
+            with self.lock:
+                  self.listeners.append(listener)
+            handler.send_response(200)
+            handler.send_header("Content-Type", "application/json")
+            handler.send_header("Transfer-Encoding", "chunked")
+            handler.end_headers()
+            try:
+                  while not self.closing.is_set():
+                        try:
+                              notification = listener.get(timeout=PING_INTERVAL)
+                        except queue.Empty:
+                              notification = {"action": "ping", "event": {}}
+                        line = json.dumps(notification).encode() + b"\n"
+                        handler.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                        handler.wfile.flush()
+            except OSError:
+                  pass
+            finally:
+                  with self.lock:
+                        self.listeners.remove(listener)
+                  handler.close_connection = True
+
+      def handler(self):
+            server = self
+
+            class Handler(BaseHTTPRequestHandler):
+                  protocol_version = "HTTP/1.1"
+                  disable_nagle_algorithm = True
+
+                  def answer(self, method:str):
+                        length = int(self.headers.get("Content-Length") or 0)
+                        body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+                        path = self.path.split("?")[0].rstrip("/")
+                        server.requests.append((method, path))
+                        if method == "GET" and path == f"/v2/projects/{server.project_id}/notifications":
+                              return server.stream(self)
+                        status, result = server.route(method, path, body)
+                        data = json.dumps(result).encode()
+                        self.send_response(status)
+                        self.send_header("Content-Type", "application/json")
+                        self.send_header("Content-Length", str(len(data)))
+                        self.end_headers()
+                        self.wfile.write(data)
+
+                  def do_GET(self):
+                        self.answer("GET")
+
+                  def do_POST(self):
+                        self.answer("POST")
+
+                  def do_PUT(self):
+                        self.answer("PUT")
+
+                  def log_message(self, *_):
+                        pass
+
+            return Handler
+
+
+def check_intent(nb_switch:int = 4, nb_pc:int = 8) -> dict:
+      return {
+            "Open vSwitch": nb_switch, "gossiptcpudp": nb_pc, "ip_range": "192.168.1.0/24",
+            "protocol": "TCP", "block_name": "block_50KB", "max_block": 2, "block_gen_time": 1000, "f_out": 1,
+            "link_filter": {"delay": [5]},
+      }
+
+
+def state_threads() -> list[threading.Thread]:
+      return [thread for thread in threading.enumerate() if thread.name.startswith("gns3-state-")]
+
+
+def check_generator():
+      """generates every mesh against the mock : all the requests go to the given url, the manifest
+      matches what the server holds and the mirror of the project is stopped, also on failure"""
+      from .topology_generator import TopologyGenerator
+
+      intent = check_intent()
+      for mesh in (TopologyType.BUS, TopologyType.CLUSTERED2, TopologyType.FULL_MESH, TopologyType.CLUSTERED3):
+            with MockGns3Server() as server:
+                  generator = TopologyGenerator(mesh, intent, server.project_name, url=server.url)
+                  manifest = generator.build_manifest()
+                  assert not state_threads(), "the mirror of the project is still running"
+                  assert len(manifest.nodes) == len(server.nodes) == intent["Open vSwitch"] + intent["gossiptcpudp"]
+                  assert {link.link_id for link in manifest.links} == set(server.links)
+                  for link in manifest.links:
+                        assert server.links[link.link_id]["filters"] == link.filters
+                  for record in manifest.nodes:
+                        assert generator.state.ports_in_use(record.node_id) == manifest.ports_in_use(record)
+                  filtered = [link for link in manifest.switch_links() if link.filters]
+                  assert (mesh in (TopologyType.BUS, TopologyType.CLUSTERED2)) == bool(filtered)
+                  print(f"  ✅ {mesh.value} : {len(server.nodes)} nodes, {len(server.links)} links, {len(server.requests)} requests")
+
+      # a template missing on the server makes the generation fail after the mirror is started
+      with MockGns3Server(templates=["Open vSwitch"]) as server:
+            try:
+                  TopologyGenerator(TopologyType.BUS, intent, server.project_name, url=server.url)
+            except ValueError as e:
+                  print(f"  ✅ Failed generation : {e}")
+            else:
+                  raise AssertionError("the generation should fail without the pc template")
+            assert not state_threads(), "the mirror of the project leaked after a failed generation"
+
+
+def check_placement():
+      """computes listed by the mock ("auto") or by the intent : the switches are placed as
+      plan_placement says and every node is created on the compute of its switch"""
+      from .topology_generator import TopologyGenerator
+
+      computes = ["local", "vm1", "vm2"]
+      for listed in ("auto", computes[1:]):
+            intent = {**check_intent(6, 12), "computes": listed}
+            with MockGns3Server(computes=computes) as server:
+                  generator = TopologyGenerator(TopologyType.BUS, intent, server.project_name, url=server.url)
+                  expected = plan_placement(6, switch_edges(TopologyType.BUS, 6), generator.pcs_per_switch(),
+                                            computes if listed == "auto" else listed)
+                  assert generator.switch_computes == expected
+                  assert [generator.compute_of(i) for i in range(6)] == [{"compute_id": c} for c in expected]
+                  manifest = generator.build_manifest()
+                  for node in manifest.nodes:
+                        switch = node if node.is_switch else manifest.nodes[node.switch]
+                        assert server.nodes[node.node_id]["compute_id"] == expected[switch.index]
+                  print(f"  ✅ Placement over {listed} : {expected}")
+
+      with MockGns3Server() as server:
+            generator = TopologyGenerator(TopologyType.BUS, check_intent(), server.project_name, url=server.url)
+            assert generator.switch_computes is None and generator.compute_of(0) == {}
+            assert {node["compute_id"] for node in server.nodes.values()} == {"local"}
+            print("  ✅ No placement without computes in the intent")
+
+
+if __name__ == "__main__":
+      print("🧪 Generator against a mock gns3 server")
+      check_generator()
+      check_placement()
+      print("✅ All checks passed")
@@ -0,0 +1,119 @@
+"""
+Placement of a topology over several gns3 computes : each switch goes to a compute together with
+the pcs attached to it. The planner balances the expected load of the computes (one unit per
+switch, PC_WEIGHT per pc and LINK_WEIGHT per switch link for the traffic it forwards) and
+minimizes the number of switch links crossing two computes (these links become udp tunnels
+between the computes).
+"""
+
+PC_WEIGHT = 1.0
+LINK_WEIGHT = 0.5
+BALANCE_TOLERANCE = 0.1
+MAX_PASSES = 10
+
+
+def switch_loads(nb_switch:int, edges:list[tuple[int, int]], pcs_per_switch:list[int]) -> list[float]:
+      """expected load of each switch and of the pcs attached to it"""
+      degrees = [0] * nb_switch
+      for a, b in edges:
+            degrees[a] += 1
+            degrees[b] += 1
+      return [1 + PC_WEIGHT * pcs_per_switch[i] + LINK_WEIGHT * degrees[i] for i in range(nb_switch)]
+
+
+def cut_size(edges:list[tuple[int, int]], assignment:list[int]) -> int:
+      """number of switch links crossing two computes"""
+      return sum(assignment[a] != assignment[b] for a, b in edges)
+
+
+def plan_placement(nb_switch:int, edges:list[tuple[int, int]], pcs_per_switch:list[int],
+                   computes:list[str], capacities:list[float]|None = None) -> list[str]:
+      """assigns every switch (and its pcs) to a compute
+
+      the switches are first cut in contiguous chunks following a depth first order (neighbors
+      stay together), then single switch moves that reduce the cut are applied while the load of
+      each compute stays within BALANCE_TOLERANCE of its share
+
+      :param nb_switch: number of switches
+      :type nb_switch: int
+      :param edges: links between switches (switch indexes)
+      :type edges: list[tuple[int, int]]
+      :param pcs_per_switch: number of pcs attached to each switch
+      :type pcs_per_switch: list[int]
+      :param computes: compute ids available
+      :type computes: list[str]
+      :param capacities: relative capacity of each compute, defaults to the same for all
+      :type capacities: list[float] | None, optional
+      :return: the compute id of each switch
+      :rtype: list[str]
+      """
+      if len(computes) <= 1 or nb_switch == 0:
+            return [computes[0] if computes else "local"] * nb_switch
+
+      capacities = capacities or [1.0] * len(computes)
+      loads = switch_loads(nb_switch, edges, pcs_per_switch)
+      total = sum(loads)
+      targets = [total * c / sum(capacities) for c in capacities]
+      limits = [t * (1 + BALANCE_TOLERANCE) for t in targets]
+
+      neighbors:list[list[int]] = [[] for _ in range(nb_switch)]
+      for a, b in edges:
+            neighbors[a].append(b)
+            neighbors[b].append(a)
+
+      # depth first order over every connected component
+      order, seen = [], set()
+      for start in range(nb_switch):
+            stack = [start]
+            while stack:
+                  current = stack.pop()
+                  if current in seen:
+                        continue
+                  seen.add(current)
+                  order.append(current)
+                  stack.extend(reversed(neighbors[current]))
+
+      # contiguous chunks of the order, one per compute
+      assignment = [0] * nb_switch
+      compute_loads = [0.0] * len(computes)
+      current = 0
+      for switch in order:
+            if compute_loads[current] + loads[switch] / 2 > targets[current] and current < len(computes) - 1:
+                  current += 1
+            assignment[switch] = current
+            compute_loads[current] += loads[switch]
+
+      # greedy refinement : move a switch to the compute holding most of its neighbors
+      for _ in range(MAX_PASSES):
+            moved = False
+            for switch in order:
+                  source = assignment[switch]
+                  counts = [0] * len(computes)
+                  for neighbor in neighbors[switch]:
+                        counts[assignment[neighbor]] += 1
+                  for target in sorted(range(len(computes)), key=lambda c: -counts[c]):
+                        gain = counts[target] - counts[source]
+                        if target == source or gain <= 0:
+                              break
+                        if compute_loads[target] + loads[switch] <= limits[target]:
+                              assignment[switch] = target
+                              compute_loads[source] -= loads[switch]
+                              compute_loads[target] += loads[switch]
+                              moved = True
+                              break
+            if not moved:
+                  break
+
+      return [computes[c] for c in assignment]
+
+
+def placement_summary(edges:list[tuple[int, int]], pcs_per_switch:list[int], placement:list[str]) -> dict:
+      """cut and load per compute of a placement (stored in the manifest)"""
+      computes = sorted(set(placement))
+      index = {compute: i for i, compute in enumerate(computes)}
+      loads = switch_loads(len(placement), edges, pcs_per_switch)
+      return {
+            "computes": computes,
+            "cross_compute_links": cut_size(edges, [index[c] for c in placement]),
+            "loads": {c: sum(l for l, p in zip(loads, placement) if p == c) for c in computes},
+      }
@@ -0,0 +1,276 @@
+import re
+import heapq
+import random
+from enum import Enum
+from math import ceil, log
+from collections import deque
+
+from .manifest import Manifest, SWITCH, PC
+
+
+"""
+Topology plan : switch links of each type of topology, graph metrics of a topology (diameter,
+hop count distribution, cumulative link delay, bottleneck bandwidth) and the run budget derived
+from them. Nothing here needs gns3 so a topology can be planned offline.
+
+Model of the expected completion time of a run (all times in ms) :
+      - bottleneck : bandwidth / (pc pairs crossing the most loaded switch link / pc pairs crossing
+        the link of one pc), every link is shaped to the same rate and shared by the pairs crossing it
+      - per hop transmission of a block : block_size / bottleneck
+      - one gossip round on the worst path : delay diameter + (hop diameter + 1) * transmission
+      - rounds to reach every pc : ceil(log_{f_out + 1}(#pcs))
+      - blocks are generated every max(BLOCK_GEN_TIME, F_OUT * transmission) (the sender is the bottleneck otherwise)
+      - completion : (MAX_BLOCK - 1) * generation + rounds * round + PULL_INTERVAL
+"""
+
+def generic_filter(intent:dict|None = None):
+      """filters of the delayed switch links : the "link_filter" of the intent (e.g. {"delay": [10]}), 
+      a random delay of 1 to 20 ms by default"""
+      if intent and intent.get("link_filter") is not None:
+            return dict(intent["link_filter"])
+      return {"delay": [random.randrange(1, 21)]}
+
+class TopologyType(Enum):
+      CURRENT_MESH      =    "currentmesh"
+      FULL_MESH         =    "fullmesh"
+      BUS               =    "bus"
+      CLUSTERED2        =    "clustered2"
+      CLUSTERED3        =    "clustered3"
+      RANDOM            =    "random"
+      HIERARCHICAL      =    "hierarchical"
+
+# meshes whose switch links get the filters of generic_filter
+FILTERED_MESHES = (TopologyType.BUS, TopologyType.CLUSTERED2)
+
+SAFETY_FACTOR = 1.5
+STARTUP_MARGIN = 5    # seconds for the entrypoints to start
+MIN_TIMEOUT = 10      # seconds
+
+
+def block_size_bytes(block_name:str) -> int:
+      """size of a block from its file name (block_50KB, block_5MB, ...)"""
+      match = re.search(r"(\d+)\s*([KMG]?)B", block_name, re.IGNORECASE)
+      if not match:
+            return 0
+      return int(match.group(1)) * {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3}[match.group(2).upper()]
+
+
+def choose_links_at_random(n):
+      set_of_links = set()
+      for i in range(n - 1):
+            set_of_links.add((i, i+1))
+            set_of_links.add((i+1, i))
+      set_of_links.add((0, n - 1))
+      set_of_links.add((n - 1, 0))
+      l = list(range(n))
+      # n switches have at most n*(n-1) ordered pairs
+      while len(set_of_links) < min(n*3, n*(n-1)):
+            sa = random.choice(l)
+            l.remove(sa)
+            sb = random.choice(l)
+            l.remove(sb)
+            set_of_links.add((sa, sb))
+            set_of_links.add((sb, sa))
+            l.append(sa)
+            l.append(sb)
+      return set_of_links
+
+
+def switch_edges(type:TopologyType, n:int) -> list[tuple[int, int]]:
+      """links between switches (switch indexes) of a topology of n switches"""
+      match type:
+            case TopologyType.FULL_MESH:
+                  return [(i, j) for i in range(n) for j in range(i + 1, n)]
+            case TopologyType.BUS | TopologyType.CLUSTERED2:
+                  return [(i, i + 1) for i in range(n - 1)] + [(0, n - 1)]
+            case TopologyType.CLUSTERED3:
+                  return sorted({(min(sa, sb), max(sa, sb)) for sa, sb in choose_links_at_random(n)})
+      return []
+
+
+def planned_manifest(type:TopologyType, intent:dict) -> Manifest:
+      """manifest of a topology as it would be generated (no gns3 ids, same filters as the generator)
+
+      :param type: the type of topology
+      :type type: TopologyType
+      :param intent: the intent of the topology
+      :type intent: dict
+      :return: the planned manifest
+      :rtype: Manifest
+      """
+      nb_switch, nb_pc = intent["Open vSwitch"], intent["gossiptcpudp"]
+      manifest = Manifest({"mesh": type.value, "intent": intent})
+      pc_idx = 0
+      for i in range(nb_switch):
+            manifest.add_node(SWITCH, i, f"S{i}", "")
+            for j in range(nb_pc // nb_switch):
+                  manifest.add_node(PC, pc_idx, f"PC{pc_idx}", "", switch=f"S{i}", port=8300 + pc_idx)
+                  manifest.add_link("", f"PC{pc_idx}", 0, f"S{i}", j)
+                  pc_idx += 1
+      edges = switch_edges(type, nb_switch)
+      for index, (a, b) in enumerate(edges):
+            # the bus and the clustered2 ring get a delay on their links (not on the closing one for clustered2)
+            filtered = type in FILTERED_MESHES and (type == TopologyType.BUS or index < len(edges) - 1)
+            manifest.add_link("", f"S{a}", -1, f"S{b}", -1, generic_filter(intent) if filtered else {})
+      return manifest
+
+
+def link_delay(filters:dict) -> float:
+      """delay in ms added by the gns3 filters of a link"""
+      return float(filters.get("delay", [0])[0]) if filters else 0.0
+
+
+def switch_graph(manifest:Manifest) -> dict[int, list[tuple[int, float]]]:
+      """adjacency of the switches : {switch row: [(neighbor row, delay in ms), ...]}"""
+      graph = {switch.row: [] for switch in manifest.switches()}
+      for link in manifest.switch_links():
+            delay = link_delay(link.filters)
+            graph[link.a].append((link.b, delay))
+            graph[link.b].append((link.a, delay))
+      return graph
+
+
+def bfs_hops(graph:dict[int, list[tuple[int, float]]], source:int) -> dict[int, int]:
+      hops = {source: 0}
+      queue = deque([source])
+      while queue:
+            current = queue.popleft()
+            for neighbor, _ in graph[current]:
+                  if neighbor not in hops:
+                        hops[neighbor] = hops[current] + 1
+                        queue.append(neighbor)
+      return hops
+
+
+def switch_link_loads(manifest:Manifest) -> dict[tuple[int, int], int]:
+      """number of pc pairs whose (breadth first) shortest path crosses each switch link
+
+      :return: {(switch row, switch row): pairs}, rows are sorted in the key
+      :rtype: dict[tuple[int, int], int]
+      """
+      graph = switch_graph(manifest)
+      weights = {row: 0 for row in graph}
+      for pc in manifest.pcs():
+            weights[pc.switch] = weights.get(pc.switch, 0) + 1
+      loads:dict[tuple[int, int], int] = {}
+      for source in graph:
+            parents = {source: source}
+            queue = deque([source])
+            while queue:
+                  current = queue.popleft()
+                  for neighbor, _ in graph[current]:
+                        if neighbor not in parents:
+                              parents[neighbor] = current
+                              queue.append(neighbor)
+            for target in parents:
+                  pairs = weights[source] * weights[target]
+                  while target != source and pairs:
+                        key = (min(target, parents[target]), max(target, parents[target]))
+                        loads[key] = loads.get(key, 0) + pairs
+                        target = parents[target]
+      return loads
+
+
+def dijkstra_delays(graph:dict[int, list[tuple[int, float]]], source:int) -> dict[int, float]:
+      delays = {source: 0.0}
+      heap = [(0.0, source)]
+      while heap:
+            delay, current = heapq.heappop(heap)
+            if delay > delays[current]:
+                  continue
+            for neighbor, link in graph[current]:
+                  if delay + link < delays.get(neighbor, float("inf")):
+                        delays[neighbor] = delay + link
+                        heapq.heappush(heap, (delay + link, neighbor))
+      return delays
+
+
+class TopologyPlan:
+      """metrics and run budget of a topology"""
+
+      def __init__(self, manifest:Manifest, intent:dict) -> None:
+            """computes the metrics from the links of the manifest and the budget from the intent
+
+            :param manifest: manifest of the deployment
+            :type manifest: Manifest
+            :param intent: intent used to generate the topology
+            :type intent: dict
+            """
+            self.intent = intent
+            self.metrics = self.compute_metrics(manifest)
+            self.budget = self.compute_budget()
+
+      def compute_metrics(self, manifest:Manifest) -> dict:
+            """hop counts are counted between pcs (pc → switch → ... → switch → pc), pairs of
+            switches are weighted by the number of pcs attached to them"""
+            graph = switch_graph(manifest)
+            weights = {row: 0 for row in graph}
+            for pc in manifest.pcs():
+                  weights[pc.switch] = weights.get(pc.switch, 0) + 1
+
+            hop_distribution:dict[int, int] = {}
+            hop_diameter, delay_diameter, total_delay, pairs = 0, 0.0, 0.0, 0
+            for source in graph:
+                  hops = bfs_hops(graph, source)
+                  delays = dijkstra_delays(graph, source)
+                  for target, hop in hops.items():
+                        # pcs on the same switch are also a pair (except a pc with itself)
+                        nb_pairs = weights[source] * (weights[target] - (source == target))
+                        if nb_pairs <= 0:
+                              continue
+                        pc_hops = hop + 2
+                        hop_distribution[pc_hops] = hop_distribution.get(pc_hops, 0) + nb_pairs
+                        hop_diameter = max(hop_diameter, pc_hops)
+                        delay_diameter = max(delay_diameter, delays[target])
+                        total_delay += delays[target] * nb_pairs
+                        pairs += nb_pairs
+
+            # the link of a pc carries the (ordered) pairs of this pc with every other one
+            nb_pc = sum(weights.values())
+            max_load = max(switch_link_loads(manifest).values(), default=0)
+            contention = max(max_load / (2 * (nb_pc - 1)), 1.0) if nb_pc > 1 else 1.0
+
+            return {
+                  "nb_switch": len(graph),
+                  "nb_pc": nb_pc,
+                  "nb_switch_links": sum(len(neighbors) for neighbors in graph.values()) // 2,
+                  "connected": len(bfs_hops(graph, next(iter(graph)))) == len(graph) if graph else True,
+                  "hop_diameter": hop_diameter,
+                  "hop_distribution": {str(hop): count for hop, count in sorted(hop_distribution.items())},
+                  "mean_hops": sum(hop * count for hop, count in hop_distribution.items()) / pairs if pairs else 0,
+                  "delay_diameter_ms": delay_diameter,
+                  "mean_delay_ms": total_delay / pairs if pairs else 0,
+                  "max_link_load": max_load,
+                  "bottleneck_mbps": self.intent.get("bandwidth_mbps", 0) / contention,
+            }
+
+      def compute_budget(self) -> dict:
+            """expected completion time, timeout and fetch schedule of a run (see the model on top)"""
+            metrics = self.metrics
+            block_bits = block_size_bytes(self.intent.get("block_name", "")) * 8
+            bandwidth = metrics["bottleneck_mbps"] * 1e6
+            transmission_ms = block_bits / bandwidth * 1000 if bandwidth else 0.0
+            f_out = max(self.intent.get("f_out", 1), 1)
+
+            round_ms = metrics["delay_diameter_ms"] + (metrics["hop_diameter"] + 1) * transmission_ms
+            rounds = ceil(log(max(metrics["nb_pc"], 2), f_out + 1))
+            generation_ms = max(self.intent.get("block_gen_time", 1000), f_out * transmission_ms)
+            completion_ms = (
+                  (self.intent.get("max_block", 1) - 1) * generation_ms
+                  + rounds * round_ms
+                  + self.intent.get("pull_interval", 4000)
+            )
+            expected = completion_ms / 1000
+            timeout = max(ceil(expected * SAFETY_FACTOR) + STARTUP_MARGIN, MIN_TIMEOUT)
+            return {
+                  "transmission_ms": transmission_ms,
+                  "round_ms": round_ms,
+                  "rounds": rounds,
+                  "expected_completion_s": expected,
+                  "timeout_s": timeout,
+                  # logs are fetched once the run should be over, then again at the timeout
+                  "fetch_schedule_s": sorted({min(ceil(expected) + STARTUP_MARGIN, timeout), timeout}),
+            }
+
+      def to_dict(self) -> dict:
+            return {"metrics": self.metrics, "budget": self.budget}
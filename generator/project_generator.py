@@ -5,6 +5,10 @@ from typing import Set
 from math import sqrt
 from enum import Enum
 import requests
+import os
+
+from .manifest import Manifest, SWITCH, PC, MANIFEST_DIR, manifest_path
+from .state import ProjectState, GNS3_URL
 
 class Protocol(Enum):
     UDP="UDP"
@@ -16,11 +20,40 @@ ProjectId = str         # TODO
 FilterDict = dict       # TODO
 LinkDict = dict         # TODO
 DockerProperties = dict # TODO
+
+# keys of the intent that end up in the environment of the gossip containers
+ENVIRONMENT_KEYS = ["protocol", "block_name", "max_block", "block_gen_time", "pull_interval", "f_out", "packet_size"]
+
+def docker_environment(intent:dict, node_idx:int, neighbors:str) -> str:
+      """environment of the gossip container of the node_idx-th pc (used to create its push_config.toml)
+
+      :param intent: the intent of the topology
+      :type intent: dict
+      :param node_idx: NODE_IDX of the pc
+      :type node_idx: int
+      :param neighbors: ips of all the pcs "IP1,IP2,..."
+      :type neighbors: str
+      :return: the environment, one VAR=value per line
+      :rtype: str
+      """
+      return "\n".join([
+            f"PACKET_SIZE={intent.get('packet_size', 1500)}",
+            f"NODE_IDX={node_idx}",
+            f"PORT={8300+node_idx}",
+            f"NEIGHBORS={neighbors}",
+            f"MAX_BLOCK={intent['max_block']}",
+            f"BLOCK_GEN_TIME={intent['block_gen_time']}",
+            f"PULL_INTERVAL={intent.get('pull_interval', 4000)}",
+            f'BLOCK_FILE="{intent["block_name"]}"',
+            "ONLY_PUSH=false",
+            f"F_OUT={intent['f_out']}",
+            f'PROTOCOL="{intent["protocol"]}"'
+      ])
       
 class ProjectGenerator:
       """Class to generate different topologies"""
 
-      def __init__(self, intent:dict, project_name:str) -> None:
+      def __init__(self, intent:dict, project_name:str, url:str = GNS3_URL) -> None:
             """basic init :
             - project data (ProjectId, Project)
             - intent file (json)
@@ -33,10 +66,15 @@ class ProjectGenerator:
             :type intent: dict
             :param project_name: name of the project
             :type project_name: str
+            :param url: url of the gns3 server, defaults to GNS3_URL
+            :type url: str, optional
             """
-            self.server = Gns3Connector("http://localhost:3080")
+            self.url = url
+            self.state:ProjectState|None = None
+            self.server = Gns3Connector(url)
             self.project = Project(name=project_name, connector=self.server)
-            self.project.get()
+            # nodes and links are mirrored from the notifications of the project instead
+            self.project.get(get_links=False, get_nodes=False, get_stats=False)
             self.project_id = self.project.project_id
             if not self.project_id : return None
             self.intent = intent
@@ -65,31 +103,33 @@ class ProjectGenerator:
 
             # init the list of pcs and switchs
             self.switchs, self.pcs, self.switch_links = [], [], []
+            # every created link : {"link_id", "a", "pa", "b", "pb", "filters"}
+            self.link_records:list[LinkDict] = []
+            # compute of each switch (and of its pcs), None to use the default compute
+            self.switch_computes:list[str]|None = None
 
             # gets the list of neighbors to pass as argument on creation of pc
             self.neighborListToStr = ""
+            self.ip_list = []
             self.set_ip_list()
             self.gen_position()
+            # started last : it is stopped by the generation (see close), nothing above may leak it
+            self.state = ProjectState(self.project_id, url).start()
+
+      def close(self):
+            """stops the mirror of the project, only needed while the nodes and links are created"""
+            if self.state is not None:
+                  self.state.stop()
 
       def get_all_used_ports(self, node:Node) -> None | Set[PortNumber]:
-            """gets all the ports connected to a node from project (requires the project to be openned)
+            """gets all the ports connected to a node from the mirror of the project (requires the project to be openned)
 
             :param node: Node
             :type node: Node
-            :param project: Project
-            :type project: Project
-            :return: a set of numbers representing the port number
+            :return: a set of numbers representing the port number (N of ethN)
             :rtype: None | Set[Portnumber]
             """
-            used_ports = set()
-            self.project.get_links()
-            for link in self.project.links:
-                  if not link       : return None
-                  if not link.nodes : return None
-                  for n in link.nodes:
-                        if n["node_id"] == node.node_id:
-                              used_ports.add(n["port_number"])
-            return used_ports
+            return self.state.ports_in_use(node.node_id)
 
       def get_free_port(self, index:int):
             """get the first free port (resquires the project to be open)
@@ -153,9 +193,9 @@ class ProjectGenerator:
             
             network = ipaddress.ip_network(ip_range, strict=False)
             start_ip = network.network_address  # first IP in the network
-            ip_list = [str(start_ip + i) for i in range(self.total_number_pc + 1)][1:]
+            self.ip_list = [str(start_ip + i) for i in range(self.total_number_pc + 1)][1:]
 
-            self.neighborListToStr = ",".join(ip_list)
+            self.neighborListToStr = ",".join(self.ip_list)
 
       def get_docker_properties(self) -> DockerProperties:
             """gets the environment variables to set for the docker container. 
@@ -167,22 +207,14 @@ class ProjectGenerator:
             """
             return {
                   "properties": {
-                              "environment": "\n".join([
-                              f"PACKET_SIZE=1500",
-                              f"NODE_IDX={self.pc_count}",
-                              f"PORT={8300+self.pc_count}",
-                              f"NEIGHBORS={self.neighborListToStr}",
-                              f"MAX_BLOCK={self.max_block}",
-                              f"BLOCK_GEN_TIME={self.block_gen_time}",
-                              "PULL_INTERVAL=4000",
-                              f'BLOCK_FILE="{self.block_name}"',
-                              "ONLY_PUSH=false",
-                              f"F_OUT={self.f_out}",
-                              f'PROTOCOL="{self.protocol}"'
-                        ])
+                        "environment": docker_environment(self.intent, self.pc_count, self.neighborListToStr)
                   }
             }
 
+      def compute_of(self, i:int) -> dict:
+            """compute_id to create the nodes of the i-th switch with (empty for the default compute)"""
+            return {"compute_id": self.switch_computes[i]} if self.switch_computes else {}
+
       def add_switch(self, i:int, all_clusters:list[tuple[int, int]]):
             """adds a switch to the switch list and creates it each switch node is based on :
             - a set of additionnal features (its position and name)
@@ -197,6 +229,7 @@ class ProjectGenerator:
                   "name": f"S{self.switch_count}",
                   "x": all_clusters[i][0] + 100,
                   "y": all_clusters[i][1] + 80, 
+                  **self.compute_of(i),
             }
             self.switchs.append(Node(
                   **self.switch_template_base,
@@ -228,6 +261,7 @@ class ProjectGenerator:
                   "name": f"PC{self.pc_count}",
                   "x": all_clusters[i][0] + 40 * (j%5),
                   "y": all_clusters[i][1] + 150 * (j%2), 
+                  **self.compute_of(i),
             }
             self.pcs[i].append(Node(
                   **node_addition,
@@ -247,34 +281,39 @@ class ProjectGenerator:
             :param switch_b: switch a
             :type switch_b: Node
             """
-            self.project.get()
-            self.project.create_link(
-                  node_a.name,
-                  f"eth{pa}",
-                  node_b.name,
-                  f"eth{pb}"
-            )
+            # the ports come from the created nodes, no need to fetch the project again
+            link = Link(**self.link_template_base, nodes=[
+                  self.port_of(node_a, f"eth{pa}"),
+                  self.port_of(node_b, f"eth{pb}"),
+            ])
+            link.create()
+            self.link_records.append({
+                  "link_id": link.link_id,
+                  "a": node_a.name, "pa": pa,
+                  "b": node_b.name, "pb": pb,
+                  "filters": {},
+            })
+
+      def port_of(self, node:Node, port_name:str) -> dict:
+            """end of a link on the port `port_name` (e.g. eth1) of a created node"""
+            ports = node.ports or (self.state.node_by_name(node.name) or {}).get("ports", [])
+            for port in ports:
+                  if port["name"] == port_name:
+                        return {"node_id": node.node_id, "adapter_number": port["adapter_number"], "port_number": port["port_number"]}
+            raise ValueError(f"No port {port_name} on {node.name}")
 
       def apply_filter_to_last_link(self, filter):
-            self.project.get_links()
-            link = self.project.links[-1]  # the most recently created link
-
-            self.apply_filter(link, filter)
+            # the most recently created link
+            self.apply_filter(self.link_records[-1]["link_id"], filter)
 
-      def apply_filter(self, link, filters):
-            link.filters = filters
-            data = {
-                  "project_id": link.project_id,
-                  "link_id": link.link_id,
-                  "link_type": link.link_type,
-                  "nodes": link.nodes,
-                  "filters": link.filters  # apply filters here
-            }
-
-            url = f"http://localhost:3080/v2/projects/{link.project_id}/links/{link.link_id}"
-            resp = requests.put(url, json=data)
+      def apply_filter(self, link_id:str, filters):
+            url = f"{self.url}/v2/projects/{self.project_id}/links/{link_id}"
+            resp = requests.put(url, json={"filters": filters})
             resp.raise_for_status()  # raise error if failed
-            link.get()
+            for record in reversed(self.link_records):
+                  if record["link_id"] == link_id:
+                        record["filters"] = filters
+                        break
             
 
       def gen_position(self):
@@ -295,19 +334,45 @@ class ProjectGenerator:
             for i in range(self.total_number_switch):
                   self.pcs.append([])
                   self.add_switch(i, self.base_position)
-            
-            # loop through all switches to create a full mesh
-            self.project.get_links()
 
-      def gen_retrieval_map(self, file_name):
-            """creates a file : retrieval map to retrieve the nodes from a created full_mesh
-            the format of the file is as followes :
-            {"switch_name : switch_id" : [list of "pc_name : pc_id"]}"""
-            data = {}
+      def build_manifest(self) -> Manifest:
+            """builds the manifest of the generated topology (nodes, roles, IPs, ports, 
+            container IDs, links and filters) from what has been created on gns3
 
+            :return: the manifest of the deployment
+            :rtype: Manifest
+            """
+            manifest = Manifest({
+                  "project_name": self.project.name,
+                  "project_id": self.project_id,
+                  "intent": self.intent,
+            })
+            # pcs are created in order, so their NODE_IDX is their position among all pcs
+            pc_idx = 0
             for index, switch in enumerate(self.switchs):
-                 data[f"{switch.name} : {switch.node_id}"] = list(map(lambda x: f"{x.name} : {x.node_id}", self.pcs[index]))
-
-            with open(f"json/{file_name}_retrieval_map.json", "w") as f:
-                  json.dump(data, f, indent=6)
-      
\ No newline at end of file
+                  manifest.add_node(SWITCH, index, switch.name, switch.node_id,
+                        container_id=(switch.properties or {}).get("container_id", ""),
+                        compute_id=switch.compute_id or "")
+                  for pc in self.pcs[index]:
+                        manifest.add_node(PC, pc_idx, pc.name, pc.node_id, switch=switch.name,
+                              ip=self.ip_list[pc_idx] if pc_idx < len(self.ip_list) else "",
+                              port=8300 + pc_idx,
+                              container_id=(pc.properties or {}).get("container_id", ""),
+                              compute_id=pc.compute_id or "")
+                        pc_idx += 1
+            for record in self.link_records:
+                  manifest.add_link(record["link_id"], record["a"], record["pa"], record["b"], record["pb"], record["filters"])
+            return manifest
+
+      def gen_manifest(self, file_name:str) -> Manifest:
+            """creates the manifest of the topology and stores it in manifests/<file_name>.manifest
+
+            :param file_name: name of the manifest (usually the project name)
+            :type file_name: str
+            :return: the manifest written
+            :rtype: Manifest
+            """
+            manifest = self.build_manifest()
+            os.makedirs(MANIFEST_DIR, exist_ok=True)
+            manifest.dump(manifest_path(file_name))
+            return manifest
@@ -0,0 +1,138 @@
+import json
+import threading
+import requests
+
+"""
+Local mirror of the state of a gns3 project kept up to date from its notification stream
+(GET /v2/projects/<id>/notifications, one json notification per line). Nodes and links are
+fetched once when the tracker starts, every change afterwards comes from the stream :
+node.created/updated/deleted, link.created/updated/deleted, project.updated/closed. The
+generator, the start barrier and the cleanup read the mirror and wait on conditions over it
+instead of polling the server. Only plain http is used (the three urls above), a local mock
+server answering them is enough to test it.
+"""
+
+GNS3_URL = "http://localhost:3080"
+CONNECT_TIMEOUT = 5
+
+
+class ProjectState:
+      """nodes and links of a gns3 project, mirrored from its notifications"""
+
+      def __init__(self, project_id:str, url:str = GNS3_URL) -> None:
+            self.project_id = project_id
+            self.url = f"{url}/v2/projects/{project_id}"
+            self.nodes:dict[str, dict] = {}
+            self.links:dict[str, dict] = {}
+            self.status = "opened"
+            self.events = 0
+            self.closed = False
+            self.changed = threading.Condition()
+            self.response:requests.Response|None = None
+            self.thread:threading.Thread|None = None
+
+      def __enter__(self):
+            return self.start()
+
+      def __exit__(self, *_):
+            self.stop()
+
+      def start(self):
+            """subscribes to the notifications then takes the snapshot of nodes and links (in this
+            order so that no change is lost in between)"""
+            self.response = requests.get(f"{self.url}/notifications", stream=True, timeout=(CONNECT_TIMEOUT, None))
+            self.response.raise_for_status()
+            nodes = requests.get(f"{self.url}/nodes").json()
+            links = requests.get(f"{self.url}/links").json()
+            with self.changed:
+                  self.nodes = {node["node_id"]: node for node in nodes}
+                  self.links = {link["link_id"]: link for link in links}
+            self.thread = threading.Thread(target=self.follow, name=f"gns3-state-{self.project_id}", daemon=True)
+            self.thread.start()
+            return self
+
+      def stop(self):
+            if self.response is not None:
+                  self.response.close()
+            if self.thread is not None:
+                  self.thread.join(timeout=CONNECT_TIMEOUT)
+
+      def follow(self):
+            try:
+                  for line in self.response.iter_lines():
+                        if line:
+                              self.apply(json.loads(line))
+            except (requests.RequestException, ValueError, AttributeError):
+                  # the stream is closed by stop() or by the server
+                  pass
+            finally:
+                  with self.changed:
+                        self.closed = True
+                        self.changed.notify_all()
+
+      def apply(self, notification:dict):
+            """updates the mirror with one notification (pings and logs are ignored)"""
+            action = notification.get("action", "")
+            event = notification.get("event") or {}
+            kind, _, change = action.partition(".")
+            tables = {"node": (self.nodes, "node_id"), "link": (self.links, "link_id")}
+            with self.changed:
+                  if kind in tables and event.get("project_id", self.project_id) == self.project_id:
+                        items, key = tables[kind]
+                        if change == "deleted":
+                              items.pop(event.get(key), None)
+                        elif key in event:
+                              items[event[key]] = {**items.get(event[key], {}), **event}
+                  elif action == "project.updated":
+                        self.status = event.get("status", self.status)
+                  elif action == "project.closed":
+                        self.status = "closed"
+                  else:
+                        return
+                  self.events += 1
+                  self.changed.notify_all()
+
+      def wait_for(self, predicate, timeout:float|None = None) -> bool:
+            """waits until predicate(self) is true
+
+            :return: False on timeout or when the stream is closed before
+            :rtype: bool
+            """
+            with self.changed:
+                  self.changed.wait_for(lambda: self.closed or predicate(self), timeout)
+                  return bool(predicate(self))
+
+      def node_by_name(self, name:str) -> dict|None:
+            with self.changed:
+                  return next((node for node in self.nodes.values() if node.get("name") == name), None)
+
+      def ports_in_use(self, node_id:str) -> set[int]:
+            """N of the ethN ports linked on a node (the adapter number of the docker nodes, their
+            port number is always 0)"""
+            with self.changed:
+                  return {
+                        end["adapter_number"] for link in self.links.values()
+                        for end in link.get("nodes", []) if end["node_id"] == node_id
+                  }
+
+      def not_started(self, node_ids) -> list[str]:
+            with self.changed:
+                  return [node_id for node_id in node_ids if self.nodes.get(node_id, {}).get("status") != "started"]
+
+      def wait_started(self, node_ids, timeout:float|None = None) -> list[str]:
+            """start barrier : waits until every node is started
+
+            :return: the nodes still not started after the timeout
+            :rtype: list[str]
+            """
+            node_ids = list(node_ids)
+            self.wait_for(lambda state: not state.not_started(node_ids), timeout)
+            return self.not_started(node_ids)
+
+      def wait_removed(self, node_ids=(), link_ids=(), timeout:float|None = None) -> bool:
+            """waits until the nodes and links are deleted (all of them when none are given)"""
+            node_ids, link_ids = set(node_ids), set(link_ids)
+            return self.wait_for(lambda state: not (
+                  (node_ids & state.nodes.keys() if node_ids else state.nodes)
+                  or (link_ids & state.links.keys() if link_ids else state.links)
+            ), timeout)
@@ -1,24 +1,14 @@
 import json
-from enum import Enum
 from .project_generator import ProjectGenerator
-import random
-
-def generic_filter():
-      return {"delay": [random.randrange(1, 21)]}
-
-class TopologyType(Enum):
-      CURRENT_MESH      =    "currentmesh"
-      FULL_MESH         =    "fullmesh"
-      BUS               =    "bus"
-      CLUSTERED2        =    "clustered2"
-      CLUSTERED3        =    "clustered3"
-      RANDOM            =    "random"
-      HIERARCHICAL      =    "hierarchical"
-      
+from .state import GNS3_URL
+from .manifest import Manifest
+from .plan import TopologyPlan, TopologyType, generic_filter, switch_edges
+from .placement import plan_placement, placement_summary
+
 class TopologyGenerator(ProjectGenerator):
       """Class to generate different topologies"""
 
-      def __init__(self, type:TopologyType, intent:dict, project_name:str) -> None:
+      def __init__(self, type:TopologyType, intent:dict, project_name:str, url:str = GNS3_URL) -> None:
             """basic init :
             - project data (ProjectId, Project)
             - intent file (json)
@@ -31,19 +21,54 @@ class TopologyGenerator(ProjectGenerator):
             :type intent: dict
             :param project_name: name of the project
             :type project_name: str
+            :param url: url of the gns3 server, defaults to GNS3_URL
+            :type url: str, optional
             """
-            super().__init__(intent, project_name)
+            super().__init__(intent, project_name, url)
             self.type = type
-            match self.type:
-                  case TopologyType.FULL_MESH:
-                        self.gen_full_mesh()
-                  case TopologyType.BUS:
-                        self.gen_bus_mesh()
-                  case TopologyType.CLUSTERED2:
-                        self.gen_clustered2_mesh()
-                  case TopologyType.CLUSTERED3:
-                        self.gen_clustered3_mesh()
-
+            try:
+                  # links between switches and computes are planned before any node is created
+                  self.switch_edges = self.plan_switch_edges()
+                  self.plan_compute_placement()
+                  match self.type:
+                        case TopologyType.FULL_MESH:
+                              self.gen_full_mesh()
+                        case TopologyType.BUS:
+                              self.gen_bus_mesh()
+                        case TopologyType.CLUSTERED2:
+                              self.gen_clustered2_mesh()
+                        case TopologyType.CLUSTERED3:
+                              self.gen_clustered3_mesh()
+            finally:
+                  self.close()
+
+      def build_manifest(self) -> Manifest:
+            manifest = super().build_manifest()
+            manifest.meta["mesh"] = self.type.value
+            manifest.meta["plan"] = TopologyPlan(manifest, self.intent).to_dict()
+            if self.switch_computes:
+                  manifest.meta["placement"] = placement_summary(self.switch_edges, self.pcs_per_switch(), self.switch_computes)
+            return manifest
+
+      def plan_switch_edges(self) -> list[tuple[int, int]]:
+            """links between switches (switch indexes) of the topology to generate"""
+            return switch_edges(self.type, self.total_number_switch)
+
+      def pcs_per_switch(self) -> list[int]:
+            return [self.total_number_pc // self.total_number_switch] * self.total_number_switch
+
+      def plan_compute_placement(self):
+            """spreads the switches (and their pcs) over the computes listed in the intent 
+            ("computes": [compute ids] or "auto" for every compute registered on the server at self.url)"""
+            computes = self.intent.get("computes")
+            if not computes:
+                  return
+            if computes == "auto":
+                  computes = [compute["compute_id"] for compute in self.server.get_computes()]
+            self.switch_computes = plan_placement(
+                  self.total_number_switch, self.switch_edges, self.pcs_per_switch(), computes
+            )
+            print(f"🖥 Placement over {len(computes)} computes : {placement_summary(self.switch_edges, self.pcs_per_switch(), self.switch_computes)}")
 
 
       def gen_clustered2_mesh(self):
@@ -51,44 +76,17 @@ class TopologyGenerator(ProjectGenerator):
             for index, value in enumerate(self.switchs[:-1]):
                   pa, pb = self.get_free_port(index), self.get_free_port(index+1)
                   self.add_link(value, pa, self.switchs[index+1], pb)
-                  self.apply_filter_to_last_link(generic_filter())
+                  self.apply_filter_to_last_link(generic_filter(self.intent))
             pa, pb = self.get_free_port(0), self.get_free_port(-1)
-            self.add_link(self.switchs[0], 0, self.switchs[-1], -1)
+            self.add_link(self.switchs[0], pa, self.switchs[-1], pb)
             
 
-      def choose_links_at_random(self, n):
-            set_of_links = set()
-            for i in range(n - 1):
-                  set_of_links.add((i, i+1))
-                  set_of_links.add((i+1, i))
-            set_of_links.add((0, n - 1))
-            set_of_links.add((n - 1, 0))
-            l = list(range(n))
-            while len(set_of_links) < n*3:
-                  sa = random.choice(l)
-                  l.remove(sa)
-                  sb = random.choice(l)
-                  l.remove(sb)
-                  set_of_links.add((sa, sb))
-                  set_of_links.add((sb, sa))
-                  l.append(sa)
-                  l.append(sb)
-            return set_of_links
-
-
-
       def gen_clustered3_mesh(self):
-            set_of_links = self.choose_links_at_random(self.total_number_switch)
-            indexes = []
+            # links are chosen at random in plan_switch_edges
             self.gen_base()
-            for (sa, sb) in set_of_links:
-                  if (sa, sb) in indexes:
-                        continue
-                  if (sb, sa) in indexes:
-                        continue
+            for (sa, sb) in self.switch_edges:
                   pa, pb = self.get_free_port(sa), self.get_free_port(sb)
                   self.add_link(self.switchs[sa], pa, self.switchs[sb], pb)
-                  indexes.append((sa, sb))
 
 
       
@@ -97,10 +95,10 @@ class TopologyGenerator(ProjectGenerator):
             for index, value in enumerate(self.switchs[:-1]):
                   pa, pb = self.get_free_port(index), self.get_free_port(index+1)
                   self.add_link(value, pa, self.switchs[index+1], pb)
-                  self.apply_filter_to_last_link(generic_filter())
+                  self.apply_filter_to_last_link(generic_filter(self.intent))
             pa, pb = self.get_free_port(0), self.get_free_port(-1)
             self.add_link(self.switchs[0], pa, self.switchs[-1], pb)
-            self.apply_filter_to_last_link(generic_filter())
+            self.apply_filter_to_last_link(generic_filter(self.intent))
 
 
       def gen_full_mesh(self):
@@ -3,37 +3,28 @@ import docker
 from docker.models.containers import Container
 from gns3fy import Gns3Connector, Project, Node
 from load_simulation import run_gossip_sequence
+from generator.manifest import Manifest, manifest_path
 import re
 
 
 """This file is not used yet : implementation of docker container manipulation using OOP"""
 
-def get_id(nameId:str) -> str:
-      """get id from retriever map
-
-      :param nameId: name and id in a string 
-      :type nameId: str
-      :return: the id
-      :rtype: str
-      """
-      return nameId.split(":")[1].strip()
-
 class DockerEdit:
       """class to manage every docker edits (should be joinned with load_simulation later)"""
 
-      def __init__(self, project_name:str, retriever:dict) -> None:
+      def __init__(self, project_name:str, manifest:Manifest) -> None:
             """basic init like in topology + docker initialization
 
             :param project_name: project name
             :type project_name: str
-            :param retriever: retriever dict from json
-            :type retriever: dict
+            :param manifest: manifest of the deployment
+            :type manifest: Manifest
             """
             server = Gns3Connector("http://localhost:3080")
             self.project = Project(name=project_name, connector=server)
             self.project.get()  # type: ignore
             self.project_id = self.project.project_id # type: ignore
-            self.retriever = retriever
+            self.manifest = manifest
 
             self.dockerClient       = docker.from_env()
             self.dockerContainers   = []
@@ -44,13 +35,13 @@ class DockerEdit:
             some commands later on"""
             self.switches     = []
             self.pcs          = []
-            for switch, pcList in self.retriever.items():
+            for switch in self.manifest.switches():
                   self.switches.append(
-                        Node(node_id=get_id(switch))
+                        Node(node_id=switch.node_id)
                   )
                   self.pcs.append(map(
-                        lambda x: Node(node_id=get_id(x)),
-                        pcList
+                        lambda x: Node(node_id=x.node_id),
+                        self.manifest.pcs_of(switch)
                   ))
 
       def retrieve_docker_containers(self):
@@ -102,9 +93,6 @@ class DockerEdit:
             return
 
 
-# with open( "json/fullmesh_retrieval_map.json", "r") as f:
-#       retrieval = json.load(f)
-
-# dock = DockerEdit("testTCP", retrieval)
+# dock = DockerEdit("testTCP", Manifest.load(manifest_path("testTCP")))
 # dock.retrieve_topology()
 # dock.run_gossip_sequence(20)
\ No newline at end of file
@@ -1,7 +1,5 @@
 from gns3fy import Gns3Connector, Project, Node, Link
 
-from automation import PROJECT_NAME
-
 
 """
 test functions to manipulate filters on links : 
@@ -12,15 +10,14 @@ test functions to manipulate filters on links :
 """
 PROJECT_NAME = "link test"
 
-# Connect to local GNS3 server
-server = Gns3Connector("http://localhost:3080")
-
 
 def create_topology(project_name=PROJECT_NAME):
       """
       Create a simple topology with two VPCS and one Ethernet switch.
       Returns the Project object.
       """
+      # Connect to local GNS3 server
+      server = Gns3Connector("http://localhost:3080")
       project = Project(name=project_name, connector=server)
       project.get()
 
@@ -1,15 +1,22 @@
-from tkinter import W
 import docker
 from docker.models.containers import Container
 import time
 import os
-import re
 import json
 
-from useless.fetch_data import fetch_data
-from generator import *
+from generator import TopologyGenerator, TopologyType, Manifest, NodeRecord, manifest_path
+from generator.state import ProjectState, GNS3_URL
 from cleanup import full_cleanup
-from gns3fy import Gns3Connector, Project 
+from telemetry import TelemetrySampler
+from resources import apply_resources
+from blocks import push_block
+from analysis import analyze
+from churn import ChurnScheduler, build_timeline
+from capture import LinkCapture, choose_capture_links
+from port_counters import PortCounterCollector
+from agent import AgentPool
+from topology_cache import TopologyCache
+from gns3fy import Gns3Connector, Node
 
 
 """
@@ -20,6 +27,7 @@ Try to automate the realization of one single experience :
       - load the gossip protocol on all nodes
       - shutdown every node after X seconds of execution
 """
+START_TIMEOUT = 60
 HOME_DIR = "/run/media/theophile/Windows/Users/theop/Documents/_Perso/_Etudes/_INSA/_4TC1/networksProject/code/results"
 
 # bw reduction commands (depends on the type of nodes)
@@ -39,7 +47,8 @@ GOSSIP_CONTAINER = {
       "gossip_seq": "bash -c 'cd /app && ./entrypoint.sh'"
 }
 
-is_switch = lambda container: container.exec_run("which ovs-vsctl", user="root").exit_code == 0
+# computes whose containers run on the local docker daemon
+LOCAL_COMPUTES = ("", "local")
 
 def new_experience(experience_type:str) -> str:
       """we consider the count of all experiences to differenciate the fetches of 
@@ -67,16 +76,39 @@ def new_experience(experience_type:str) -> str:
       return dest_dir
 
 
-def run_bw_reduction(bandwidth:float=50, pc_template=GOSSIP_CONTAINER, switch_template=VSWITCH):
-      """ apply a per docker container bandwidth reduction to size bandwidth Mbps"""
-      # connect to client and list all running docker containers
+def project_containers(manifest:Manifest) -> list[tuple[NodeRecord, Container]]:
+      """resolves the running docker containers of the deployment in a single call to the local
+      docker daemon, the stages driving the containers (shaping, blocks, gossip, logs) only reach
+      these ones : nodes placed on another compute make it fail instead of running a partial
+      experiment
+
+      :param manifest: manifest of the deployment
+      :type manifest: Manifest
+      :return: list of (node of the manifest, its container)
+      :rtype: list[tuple[NodeRecord, Container]]
+      """
       client = docker.from_env()
-      container_list:list[Container] = client.containers.list(filters={"status": "running"})
-      for container in container_list:
-            if is_switch(container):
+      containers:list[Container] = client.containers.list(
+            filters={"status": "running", "id": manifest.container_ids()}
+      )
+      nodes = [(manifest.by_container_id[c.id], c) for c in containers if c.id in manifest.by_container_id]
+      found = {node.row for node, _ in nodes}
+      missing = [node for node in manifest.nodes if node.row not in found]
+      remote = [node.name for node in missing if node.compute_id not in LOCAL_COMPUTES]
+      if remote:
+            raise RuntimeError(f"{len(remote)} nodes are on a remote compute, their containers cannot be driven from here : {remote}")
+      if missing:
+            print(f"⚠️ {len(missing)} nodes have no running local container : {[node.name for node in missing]}")
+      return nodes
+
+
+def run_bw_reduction(manifest:Manifest, bandwidth:float=50, pc_template=GOSSIP_CONTAINER, switch_template=VSWITCH):
+      """ apply a per docker container bandwidth reduction to size bandwidth Mbps"""
+      for node, container in project_containers(manifest):
+            if node.is_switch:
                   print(f"→ Start the BW reduction on SWITCH {container.name}")
-                  # apply bw reduction on all network interfaces (if switch : 16 interfaces)
-                  for i in range(VSWITCH["nb_interfaces"]):
+                  # apply bw reduction on the connected network interfaces only
+                  for i in sorted(manifest.ports_in_use(node)):
                         try:
                               container.exec_run(switch_template["bw_reduction"][0](i, bandwidth), user="root", detach=True)
                               time.sleep(0.01)
@@ -88,7 +120,7 @@ def run_bw_reduction(bandwidth:float=50, pc_template=GOSSIP_CONTAINER, switch_te
             else:
                   # apply bw reduction on all network interfaces (if pc : 1 interface)
                   try:
-                        container.exec_run(pc_template["bw_reduction"][0](), user="root", detach=True)
+                        container.exec_run(pc_template["bw_reduction"][0](bandwidth), user="root", detach=True)
                         time.sleep(0.01)
                         container.exec_run(pc_template["bw_reduction"][1](bandwidth), user="root", detach=True)
                         time.sleep(0.01)
@@ -96,115 +128,209 @@ def run_bw_reduction(bandwidth:float=50, pc_template=GOSSIP_CONTAINER, switch_te
                   except Exception as e:
                         print(f"  ⚠️ Failed in {container.name}: {e}")
 
-def start_gossip(container_list:list[Container], pc_template=GOSSIP_CONTAINER, bw:int):
-      """starts the gossip protocol by running the ./entrypoint.sh command on all containers
+def start_gossip(nodes:list[tuple[NodeRecord, Container]], pc_template=GOSSIP_CONTAINER):
+      """starts the gossip protocol by running the ./entrypoint.sh command on all pcs, 
+      the sender (NODE_IDX = 0) is started last
 
-      :param container_list: list of all the container nodes on my gns3 project
-      :type container_list: list[Container]
+      :param nodes: list of the nodes of the deployment with their container
+      :type nodes: list[tuple[NodeRecord, Container]]
       """
-      sender = container_list[0]
-      for container in container_list:
-            if is_switch(container):
-                  node_idx = 1
-            else:
-                  node_idx = find_node_idx(container)
-            if node_idx != 0:
-                  try:
-                        print(f"→ Starting gossip sequence in {container.name}")
-                        container.exec_run(pc_template["gossip_seq"], user="root", detach=True)
-                        print(f"  ✅ Started gossip in {container.name}")
-                  except Exception as e:
-                        print(f"  ⚠️ Failed in {container} curl http://localhost:3080/v2/version.name: {e}")
-            else:
-                  sender = container
-      try:
-            sender.exec_run(pc_template["gossip_seq"], user="root", detach=True)
-            print(f"  ✅ Started gossip in {sender.name}")
-      except Exception as e:
-            print(f"  ⚠️ Failed in {sender.name}: {e}")
-
-
-def find_node_idx(container):
-      # Get push_config.toml
-      config_result = container.exec_run("cat /app/push_config.toml", user="root")
-      config_content = config_result.output.decode(errors="ignore")
-
-      # Extract NODE_IDX (e.g. NODE_IDX = 1)
-      match = re.search(r"NODE_IDX\s*=\s*(\S+)", config_content)
-      node_idx = match.group(1).strip() if match else container.name
-      return node_idx
-      
+      pcs = sorted((item for item in nodes if not item[0].is_switch), key=lambda item: item[0].index == 0)
+      for node, container in pcs:
+            try:
+                  print(f"→ Starting gossip sequence in {container.name} ({node.name})")
+                  container.exec_run(pc_template["gossip_seq"], user="root", detach=True)
+                  print(f"  ✅ Started gossip in {container.name}")
+            except Exception as e:
+                  print(f"  ⚠️ Failed in {container.name}: {e}")
 
-def fetch_rename_logs(container: Container, dest_dir):
+
+def fetch_rename_logs(node:NodeRecord, container: Container, dest_dir):
       """fetches the log file in a given container and stores it in the corresponding directory
-      renaming is based on the content of the push_config.toml file
+      renaming is based on the NODE_IDX of the node in the manifest
 
+      :param node: node of the manifest
+      :type node: NodeRecord
       :param container: container of a node in gns3
       :type container: Container
       """
-      print(f"→ Fetching log and config from {container.name}")
-
+      if node.is_switch:
+            return
+      print(f"→ Fetching log from {container.name} ({node.name})")
 
       # Get log content
-      if (is_switch(container)) : 
-            print("switch")
-            return
-      print("not switch")
       log_result = container.exec_run("cat /app/log.txt", user="root")
       log_content = log_result.output.decode(errors="ignore")
 
-      node_idx = find_node_idx(container)
-
       # Save log to file
-      dest_path = os.path.join(dest_dir, f"{node_idx}.txt")
+      dest_path = os.path.join(dest_dir, f"{node.index}.txt")
       with open(dest_path, "w") as f:
             f.write(log_content)
             print(f"  ✅ Saved {dest_path}")
 
 
 
-def run_gossip_sequence(wait_seconds: int = 60, bandwidth:int = 50, dest_dir=""):
+def collect_logs(nodes:list[tuple[NodeRecord, Container]], dest_dir):
+      """fetches the logs of all the pcs of the deployment in dest_dir"""
+      for node, container in nodes:
+            try:
+                  fetch_rename_logs(node, container, dest_dir)
+            except Exception as e:
+                  print(f"  ⚠️ Failed fetching from {container.name}: {e}")
+
+
+def run_gossip_sequence(manifest:Manifest, wait_seconds: int = 60, dest_dir="", telemetry_interval:float|None = None,
+                        fetch_schedule:list[float]|None = None, churn:ChurnScheduler|None = None,
+                        capture:LinkCapture|None = None, port_counters:PortCounterCollector|None = None, agents:AgentPool|None = None,
+                        on_start=None):
       """runs the full gossip sequence for 60 seconds then fetch all data
 
+      :param manifest: manifest of the deployment
+      :type manifest: Manifest
       :param wait_seconds: amount of time to wait in between the launch of all entrypoints and the fetch of the data, defaults to 60
       :type wait_seconds: int, optional
+      :param telemetry_interval: seconds between two telemetry samples (None to disable), defaults to None
+      :type telemetry_interval: float | None, optional
+      :param fetch_schedule: seconds after the launch at which the logs are fetched (each fetch 
+      overwrites the previous one), defaults to [wait_seconds]
+      :type fetch_schedule: list[float] | None, optional
+      :param churn: link changes to apply during the run, defaults to None
+      :type churn: ChurnScheduler | None, optional
+      :param capture: packet captures to run during the gossip sequence, defaults to None
+      :type capture: LinkCapture | None, optional
+      :param port_counters: sampling of the switch ports to run during the gossip sequence, defaults to None
+      :type port_counters: PortCounterCollector | None, optional
+      :param agents: agents of the containers to start the gossip and fetch the logs with (instead of docker exec), defaults to None
+      :type agents: AgentPool | None, optional
+      :param on_start: called once the gossip sequence is started, defaults to None
+      :type on_start: Callable[[], None] | None, optional
       """
-      # get docker env
-      client = docker.from_env()
-      containers:list[Container] = client.containers.list(filters={"status": "running"})
+      nodes = project_containers(manifest)
+      fetch_schedule = fetch_schedule or [wait_seconds]
+
+      print(f"Found {len(nodes)} running containers")
+      telemetry = None
+      if telemetry_interval:
+            telemetry = TelemetrySampler(manifest, [container for _, container in nodes], dest_dir, telemetry_interval)
+            telemetry.start()
+      if capture is not None:
+            capture.start()
+      if port_counters is not None:
+            port_counters.start()
+      if agents is not None:
+            agents.start_gossip()
+      else:
+            start_gossip(nodes)
+      started = time.monotonic()
+      if churn is not None:
+            churn.start(started)
+      if on_start is not None:
+            on_start()
+
+      for checkpoint in fetch_schedule:
+            remaining = checkpoint - (time.monotonic() - started)
+            print(f"⏳ Waiting {remaining:.1f} seconds before fetching data ...")
+            time.sleep(max(remaining, 0))
+            if agents is not None:
+                  agents.collect_logs(dest_dir)
+            else:
+                  collect_logs(nodes, dest_dir)
+
+      if churn is not None:
+            churn.stop(dest_dir)
+      if capture is not None:
+            capture.stop(dest_dir)
+      if port_counters is not None:
+            port_counters.stop(dest_dir)
+      if telemetry is not None:
+            telemetry.stop()
+      print("🎯 All logs collected and saved in", dest_dir)
 
-      print(f"Found {len(containers)} running containers")
-      start_gossip(containers, bandwidth)
 
-      print(f"⏳ Waiting {wait_seconds} seconds before fetching data ...")
-      time.sleep(wait_seconds)
-      
-      for container in containers:
-            try:
-                  fetch_rename_logs(container, dest_dir)
-            except Exception as e:
-                  print(f"  ⚠️ Failed fetching from {container.name}: {e}")
+def deploy(name, data) -> Manifest:
+      """cleans the project up and generates the topology of the intent ("mesh", full mesh by default), 
+      with "topology_cache" in the intent the topology is restored from the cache when it was built before
 
-      print("🎯 All logs collected and saved in", dest_dir)
+      :return: the manifest of the deployment
+      :rtype: Manifest
+      """
+      mesh = TopologyType(data.get("mesh", TopologyType.FULL_MESH))
+      cache = TopologyCache() if data.get("topology_cache") else None
+      if cache is not None:
+            manifest = cache.restore(name, mesh, data)
+            if manifest is not None:
+                  os.makedirs(os.path.dirname(manifest_path(name)), exist_ok=True)
+                  manifest.dump(manifest_path(name))
+                  return manifest
+
+      full_cleanup(name)
+      topo = TopologyGenerator(mesh, data, name)
+      manifest = topo.gen_manifest(name)
+      if cache is not None:
+            cache.store(manifest, mesh, data)
+      return manifest
+
+
+def start_nodes(manifest:Manifest, timeout:float = START_TIMEOUT):
+      """starts every node of the deployment and waits until gns3 notifies all of them as started"""
+      server = Gns3Connector(GNS3_URL)
+      project_id = manifest.meta["project_id"]
+      with ProjectState(project_id) as state:
+            for record in manifest.nodes:
+                  Node(node_id=record.node_id, project_id=project_id, connector=server).start()
+            late = state.wait_started([record.node_id for record in manifest.nodes], timeout)
+      if late:
+            print(f"⚠️ {len(late)} nodes not started after {timeout}s")
+      else:
+            print(f"✅ {len(manifest.nodes)} nodes started")
+
+
+def run_deployment(manifest:Manifest, data, dest_dir, on_start=None):
+      """prepares the running containers (resources, block, shaping) and runs the gossip sequence,
+      on_start is called once the gossip sequence is started"""
+      nodes = project_containers(manifest)
+      if "resources" in data:
+            apply_resources(manifest, nodes, data["resources"], dest_dir)
+      # the block file of the image is used unless the intent asks for the block cache
+      if data.get("block_cache"):
+            push_block(nodes, data["block_name"])
+      # with "agent" every container gets one persistent shell instead of a docker exec per command
+      agents = AgentPool(manifest, nodes) if data.get("agent") else None
+      if agents is not None:
+            agents.shape(data["bandwidth_mbps"], GOSSIP_CONTAINER, VSWITCH)
+      else:
+            run_bw_reduction(manifest, data["bandwidth_mbps"])
+      # run budget derived from the topology plan instead of a constant
+      budget = manifest.meta["plan"]["budget"]
+      print(f"⏱ Expected completion {budget['expected_completion_s']:.1f}s, timeout {budget['timeout_s']}s")
+      churn = None
+      if "churn" in data:
+            churn = ChurnScheduler(manifest, build_timeline(manifest, data["churn"], budget["timeout_s"]))
+      capture = None
+      if "capture" in data:
+            capture = LinkCapture(manifest, choose_capture_links(manifest, data["capture"].get("links", 2), data["capture"].get("seed")))
+      port_counters = None
+      if "port_counters" in data:
+            port_counters = PortCounterCollector(manifest, nodes, data["port_counters"].get("interval", 1.0), data.get("bandwidth_mbps"))
+      run_gossip_sequence(manifest, wait_seconds=budget["timeout_s"], dest_dir=dest_dir,
+                          telemetry_interval=data.get("telemetry_interval"),
+                          fetch_schedule=budget["fetch_schedule_s"], churn=churn, capture=capture,
+                          port_counters=port_counters, agents=agents, on_start=on_start)
+      if agents is not None:
+            agents.close()
 
 
 def run_experiment(filename, data):
       name = filename
 
-      full_cleanup(name)
-
-      topo = TopologyGenerator(TopologyType.FULL_MESH, data, name)
-      server = Gns3Connector("http://localhost:3080")
-      project = Project(name=name, connector=server)
+      manifest = deploy(name, data)
       dest_dir = new_experience("full_mesh")
-      project.get()
-      for node in project.nodes:
-            node.start()
-
-      time.sleep(1)
-      run_bw_reduction(data["bandwidth_mbps"])
-      run_gossip_sequence(wait_seconds=30, bandwidth=50, dest_dir=dest_dir)
-      fetch_data(data)
+      # the manifest is kept with the results for the analysis
+      manifest.dump(os.path.join(dest_dir, "topology.manifest"))
+      start_nodes(manifest)
+      run_deployment(manifest, data, dest_dir)
+      analyze(data, dest_dir)
+      return dest_dir
 
 
 if __name__ == "__main__":
@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import itertools
+import statistics
+
+from generator.project_generator import docker_environment
+from generator.plan import block_size_bytes
+from analysis import read_receptions
+from agent import AgentPool
+from blocks import push_block
+from load_simulation import deploy, start_nodes, project_containers, VSWITCH
+
+
+"""
+Micro benchmark of the transport settings : a minimal topology (one switch, three pcs) is deployed
+once, then every point of the sweep (packet size x protocol x block x bandwidth) is run on the same
+containers with hot reconfiguration through the agents :
+      - bandwidth : tc/ovs shaping replaced in place (only when it changes)
+      - block     : pushed from the block cache (only when it changes)
+      - protocol, packet size, block : push_config.toml rewritten (and checked) and the environment
+        exported, the entrypoint is restarted
+Each point ends as soon as every pc received every block (or after "point_timeout" seconds). The
+sweep comes from the intent :
+      "microbench": {"packet_size": [512, 1500], "protocol": ["UDP", "TCP"], "block_name": ["block_50KB"], "bandwidth_mbps": [10, 100]}
+The goodput and per block latency of each point, and the curves over the packet size, are stored
+in results/microbench/<time>/microbench.json.
+"""
+
+BENCH_DIR = "results/microbench"
+BENCH_FILE = "microbench.json"
+# minimal topology of the benchmark (the other settings come from the intent)
+BENCH_TOPOLOGY = {"Open vSwitch": 1, "gossiptcpudp": 3, "mesh": "fullmesh"}
+DEFAULT_SWEEP = {
+      "packet_size": [512, 1024, 1500],
+      "protocol": ["UDP", "TCP"],
+      "block_name": ["block_50KB", "block_500KB"],
+      "bandwidth_mbps": [10, 100],
+}
+# the costly changes first : the bandwidth changes the least often, the packet size the most often
+SWEEP_ORDER = ["bandwidth_mbps", "block_name", "protocol", "packet_size"]
+POINT_TIMEOUT = 60
+POLL_INTERVAL = 0.5
+
+# shaping of the pcs that can be applied again on the running containers
+RESHAPE_CONTAINER = {
+      "bw_reduction": [
+            lambda _: "tc qdisc replace dev eth0 root handle 1: htb default 1",
+            lambda bandwidth: f"tc class replace dev eth0 parent 1: classid 1:1 htb rate {bandwidth}mbit ceil {bandwidth}mbit",
+      ]
+}
+
+
+def sweep_points(sweep:dict) -> list[dict]:
+      """every point of the sweep, in SWEEP_ORDER"""
+      sweep = {**DEFAULT_SWEEP, **sweep}
+      return [dict(zip(SWEEP_ORDER, values)) for values in itertools.product(*(sweep[key] for key in SWEEP_ORDER))]
+
+
+def environment_dict(environment:str) -> dict:
+      """VAR=value lines of docker_environment as a dict (values kept as they are)"""
+      return dict(line.split("=", 1) for line in environment.splitlines() if "=" in line)
+
+
+def point_metrics(receptions:dict[int, dict[int, float]], block_bytes:int, nb_pc:int) -> dict:
+      """goodput and latencies of a point from the first reception of each block on each pc :
+            - goodput_mbps       : bytes delivered to the receivers over the time of the point
+            - block_goodput_mbps : size of a block over its median latency
+            - block latency      : time between the first and the last pc holding a block
+      """
+      times = [time for seen in receptions.values() for time in seen.values()]
+      if not times:
+            return {"blocks": 0, "complete_blocks": 0}
+      latencies = sorted(max(seen.values()) - min(seen.values()) for seen in receptions.values() if len(seen) == nb_pc)
+      delivered = sum(len(seen) - 1 for seen in receptions.values()) * block_bytes
+      span = (max(times) - min(times)) / 1000
+      median = statistics.median(latencies) if latencies else None
+      return {
+            "blocks": len(receptions),
+            "complete_blocks": len(latencies),
+            "goodput_mbps": delivered * 8 / span / 1e6 if span > 0 else None,
+            "block_goodput_mbps": block_bytes * 8 / (median / 1000) / 1e6 if median else None,
+            "median_block_latency_ms": median,
+            "p95_block_latency_ms": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else None,
+            "block_latencies_ms": latencies,
+      }
+
+
+class MicroBenchmark:
+      """sweep of the transport settings on a single minimal deployment"""
+
+      def __init__(self, name:str, intent:dict, dest_dir:str|None = None) -> None:
+            self.name = name
+            self.intent = {**intent, **BENCH_TOPOLOGY}
+            self.points = sweep_points(intent.get("microbench", {}))
+            self.timeout = intent.get("point_timeout", POINT_TIMEOUT)
+            self.dest_dir = dest_dir or os.path.join(BENCH_DIR, time.strftime("%Y%m%d-%H%M%S"))
+            self.nodes = []
+            self.agents:AgentPool|None = None
+            self.neighbors = ""
+            # pcs whose push_config.toml did not get the settings of the current point
+            self.stale:list[str] = []
+
+      def setup(self):
+            manifest = deploy(self.name, self.intent)
+            start_nodes(manifest)
+            self.nodes = project_containers(manifest)
+            self.agents = AgentPool(manifest, self.nodes)
+            self.neighbors = ",".join(pc.ip for pc in sorted(manifest.pcs(), key=lambda pc: pc.index))
+
+      def apply(self, point:dict, previous:dict) -> dict:
+            """reconfigures the running deployment for a point, only what changed is applied again"""
+            intent = {**self.intent, **point}
+            if point["bandwidth_mbps"] != previous.get("bandwidth_mbps"):
+                  self.agents.shape(point["bandwidth_mbps"], RESHAPE_CONTAINER, VSWITCH)
+            if point["block_name"] != previous.get("block_name"):
+                  push_block(self.nodes, point["block_name"])
+            self.stale = self.agents.configure(lambda agent: environment_dict(docker_environment(intent, agent.node.index, self.neighbors)))
+            return intent
+
+      def measure(self, intent:dict, point_dir:str) -> dict:
+            """runs the gossip sequence until every pc has every block (or the timeout)"""
+            os.makedirs(point_dir, exist_ok=True)
+            nb_pc = len(self.agents.pcs())
+            self.agents.stop_gossip()
+            self.agents.reset_logs()
+            started = time.monotonic()
+            self.agents.start_gossip()
+            receptions = {}
+            while time.monotonic() - started < self.timeout:
+                  time.sleep(POLL_INTERVAL)
+                  self.agents.collect_logs(point_dir, verbose=False)
+                  receptions = read_receptions(point_dir)
+                  if sum(len(seen) == nb_pc for seen in receptions.values()) >= intent["max_block"]:
+                        break
+            wall = time.monotonic() - started
+            self.agents.stop_gossip()
+            return {**point_metrics(receptions, block_size_bytes(intent["block_name"]), nb_pc), "wall_s": wall}
+
+      def curves(self, results:list[dict]) -> dict[str, list[dict]]:
+            """goodput and latency over the packet size for each protocol, block and bandwidth"""
+            curves:dict[str, list[dict]] = {}
+            for result in results:
+                  key = f"{result['protocol']}-{result['block_name']}-{result['bandwidth_mbps']}Mbps"
+                  curves.setdefault(key, []).append({
+                        "packet_size": result["packet_size"],
+                        "goodput_mbps": result.get("goodput_mbps"),
+                        "block_goodput_mbps": result.get("block_goodput_mbps"),
+                        "median_block_latency_ms": result.get("median_block_latency_ms"),
+                  })
+            for points in curves.values():
+                  points.sort(key=lambda p: p["packet_size"])
+            return curves
+
+      def run(self) -> dict:
+            """deploys the minimal topology and runs every point of the sweep
+
+            :return: the report (also written in <dest_dir>/microbench.json)
+            :rtype: dict
+            """
+            os.makedirs(self.dest_dir, exist_ok=True)
+            print(f"🔬 Micro benchmark : {len(self.points)} points on {self.intent['gossiptcpudp']} pcs")
+            self.setup()
+            results = []
+            previous:dict = {}
+            try:
+                  for index, point in enumerate(self.points):
+                        intent = self.apply(point, previous)
+                        metrics = self.measure(intent, os.path.join(self.dest_dir, str(index)))
+                        results.append({**point, **metrics, "stale_config": self.stale})
+                        previous = point
+                        print(f"  📏 {point} : goodput {metrics.get('goodput_mbps') or 0:.1f} Mbps, "
+                              f"median block latency {metrics.get('median_block_latency_ms') or 0:.0f} ms "
+                              f"({metrics.get('complete_blocks', 0)}/{intent['max_block']} blocks, {metrics['wall_s']:.1f}s)")
+            finally:
+                  self.agents.close()
+            report = {"intent": self.intent, "points": results, "curves": self.curves(results)}
+            with open(os.path.join(self.dest_dir, BENCH_FILE), "w") as f:
+                  json.dump(report, f, indent=6, default=str)
+            print(f"✅ Micro benchmark saved in {os.path.join(self.dest_dir, BENCH_FILE)}")
+            return report
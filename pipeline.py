@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from load_simulation import deploy, new_experience, start_nodes, run_deployment
+from analysis import analyze
+from cleanup import full_cleanup
+from resources import confine_host_services, restore_affinity
+from generator import Manifest
+from generator.state import GNS3_URL
+
+
+"""
+Pipelined experiments : the measured stage (start, shaping, gossip, fetch) of an experiment runs
+in the main thread while a single background lane builds the topology of the next experiment in
+a second gns3 project (deploy cleans the previous topology of that project up first) and analyzes
+the results of the previous one. The two projects are used in turn.
+
+Building a topology creates and deletes containers in the gns3 server and in dockerd, this work is
+only overlapped with the gossip sequence when it cannot land on the cores of the deployment :
+      - with "resources" in the intent, the containers of the run are pinned out of the reserved
+        cores, then once the gossip sequence is started the gns3 server and docker daemons are
+        confined to the reserved cores (needs root) and the next build is submitted. The nodes
+        are started before the confinement so that their ubridge and container processes (all
+        the traffic of the run) do not inherit the reserved cores
+      - otherwise (or when they cannot be confined) the next build is only submitted once the run
+        has fetched its logs, only the analysis overlaps with the run
+The nodes of a run are stopped as soon as its logs are fetched. The lane runs at the lowest
+scheduling priority (nice 19), which only concerns this process (the analysis and the rest calls).
+
+Only for a fixed list of experiments (the adaptive repetitions of automation.run_campaign need
+the results of a run to choose the next one).
+"""
+
+PIPELINE_REPORT = "json/pipeline_report.json"
+BACKGROUND_NICE = 19
+
+
+class ExperimentPipeline:
+      """runs a list of experiments with build, run and analysis overlapped"""
+
+      def __init__(self, name:str, nb_projects:int = 2) -> None:
+            self.projects = [f"{name}_{i}" for i in range(nb_projects)]
+            self.spans:list[dict] = []
+            self.lock = threading.Lock()
+            self.lane = ThreadPoolExecutor(max_workers=1, initializer=self.lower_priority)
+
+      @staticmethod
+      def lower_priority():
+            try:
+                  os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), BACKGROUND_NICE)
+            except (AttributeError, OSError):
+                  pass
+
+      def create_projects(self):
+            """creates the gns3 projects used in turn when they do not exist yet"""
+            from gns3fy import Gns3Connector, Project
+            server = Gns3Connector(GNS3_URL)
+            existing = {project["name"] for project in server.get_projects()}
+            for name in self.projects:
+                  if name not in existing:
+                        project = Project(name=name, connector=server)
+                        project.create()
+                        project.open()
+                        print(f"Project created: {name}")
+
+      def timed(self, stage:str, index:int, function, *args):
+            """runs a stage and records its span for the utilization report"""
+            start = time.monotonic()
+            try:
+                  return function(*args)
+            finally:
+                  with self.lock:
+                        self.spans.append({"stage": stage, "experiment": index, "start": start, "end": time.monotonic()})
+
+      def submit(self, stage:str, index:int, function, *args) -> Future:
+            return self.lane.submit(self.timed, stage, index, function, *args)
+
+      def stop_nodes(self, manifest:Manifest):
+            """stops the nodes of a run whose logs are fetched (they are deleted with the next build of the project)"""
+            from gns3fy import Gns3Connector, Project
+            try:
+                  Project(project_id=manifest.meta["project_id"], connector=Gns3Connector(GNS3_URL)).stop()
+            except Exception as e:
+                  print(f"⚠️ Failed to stop the nodes of {manifest.meta.get('project_name')}: {e}")
+
+      def run(self, experiments:list[dict]) -> dict:
+            """runs all the experiments
+
+            :return: the utilization report (also written in json/pipeline_report.json)
+            :rtype: dict
+            """
+            experiments = list(experiments)
+            self.create_projects()
+            started = time.monotonic()
+            results = []
+            build = self.submit("build", 0, deploy, self.projects[0], experiments[0]) if experiments else None
+
+            for index, data in enumerate(experiments):
+                  manifest = self.timed("wait_build", index, build.result)
+
+                  next_build:list[Future] = []
+                  def build_next():
+                        if index + 1 < len(experiments):
+                              project = self.projects[(index + 1) % len(self.projects)]
+                              next_build.append(self.submit("build", index + 1, deploy, project, experiments[index + 1]))
+
+                  dest_dir = new_experience("full_mesh")
+                  manifest.dump(os.path.join(dest_dir, "topology.manifest"))
+                  # the next build overlaps the gossip sequence only when gns3 and docker are confined,
+                  # which is done once the nodes of the run are started and pinned
+                  confined:dict[int, set[int]] = {}
+                  def confine_and_build():
+                        confined.update(confine_host_services(data["resources"]))
+                        if confined:
+                              build_next()
+                  try:
+                        self.timed("run", index, self.measured_stage, manifest, data, dest_dir,
+                                   confine_and_build if "resources" in data else None)
+                  finally:
+                        restore_affinity(confined)
+                  self.stop_nodes(manifest)
+                  if not next_build:
+                        build_next()
+                  build = next_build[0] if next_build else None
+                  results.append(dest_dir)
+                  self.submit("analysis", index, analyze, data, dest_dir)
+
+            for project in self.projects[:len(experiments)]:
+                  self.submit("cleanup", len(experiments), full_cleanup, project)
+            self.lane.shutdown(wait=True)
+            return self.report(time.monotonic() - started, results)
+
+      def measured_stage(self, manifest, data, dest_dir, on_start):
+            start_nodes(manifest)
+            run_deployment(manifest, data, dest_dir, on_start=on_start)
+
+      def report(self, wall:float, results:list[str]) -> dict:
+            """busy share of each stage over the wall time, and time the run stage overlapped the lane"""
+            busy:dict[str, float] = {}
+            for span in self.spans:
+                  busy[span["stage"]] = busy.get(span["stage"], 0.0) + span["end"] - span["start"]
+            runs = [s for s in self.spans if s["stage"] == "run"]
+            background = [s for s in self.spans if s["stage"] in ("build", "analysis")]
+            overlap = sum(
+                  max(0.0, min(r["end"], b["end"]) - max(r["start"], b["start"])) for r in runs for b in background
+            )
+            report = {
+                  "wall_s": wall,
+                  "experiments": len(results),
+                  "busy_s": busy,
+                  "utilization": {stage: value / wall for stage, value in busy.items()} if wall else {},
+                  "overlap_s": overlap,
+                  "results": results,
+            }
+            with open(PIPELINE_REPORT, "w") as f:
+                  json.dump(report, f, indent=6)
+            print(f"📊 Pipeline : {len(results)} experiments in {wall:.0f}s, "
+                  + ", ".join(f"{stage} {value:.0%}" for stage, value in report["utilization"].items()))
+            return report
@@ -0,0 +1,166 @@
+import os
+import re
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from docker.models.containers import Container
+
+from generator.manifest import Manifest, NodeRecord
+
+
+"""
+Per port traffic counters of the Open vSwitch containers during a gossip run. At every interval
+all the switches are read concurrently, one batched exec per switch returns the statistics of
+all its ports from the datapath (live counters, unlike the Interface.statistics column of the
+ovsdb which is only refreshed every stats-update-interval, 5 s by default) :
+      ovs-vsctl -f json --columns=name,ofport list interface; ovs-ofctl dump-ports <bridge> (every bridge)
+The openflow port numbers are mapped back to their ethN with the ovsdb table, each ethN of a
+switch is mapped back to its link with the manifest, the differences between two
+samples give per link and per direction throughput, utilization (against the shaped bandwidth)
+and drops. Timestamps are wall clock ms, like the gossip logs. Enabled from the intent :
+      "port_counters": {"interval": 1}
+The series are stored with the results (port_counters.json).
+"""
+
+PORT_COUNTERS_FILE = "port_counters.json"
+OFPORTS_END = "__OFPORTS_END__"
+OVS_DUMP_PORTS = (
+      "sh -c 'ovs-vsctl -f json --columns=name,ofport list interface; echo " + OFPORTS_END + "; "
+      "for bridge in $(ovs-vsctl list-br); do ovs-ofctl dump-ports $bridge; done'"
+)
+# port <number or name>: rx pkts=.., bytes=.., drop=.., errs=.. (then the same for tx on the next line)
+DUMP_PORT = re.compile(
+      r'port\s+"?(?P<port>[\w.-]+)"?:\s*rx\s+pkts=(?P<rx_packets>\d+|\?),\s*bytes=(?P<rx_bytes>\d+|\?),'
+      r'\s*drop=(?P<rx_dropped>\d+|\?),\s*errs=(?P<rx_errors>\d+|\?).*?'
+      r'tx\s+pkts=(?P<tx_packets>\d+|\?),\s*bytes=(?P<tx_bytes>\d+|\?),'
+      r'\s*drop=(?P<tx_dropped>\d+|\?),\s*errs=(?P<tx_errors>\d+|\?)',
+      re.DOTALL,
+)
+COUNTERS = ["rx_bytes", "tx_bytes", "rx_packets", "tx_packets", "rx_dropped", "tx_dropped", "rx_errors", "tx_errors"]
+MAX_WORKERS = 32
+
+
+def parse_ovs_dump_ports(output:str) -> dict[int, dict[str, int]]:
+      """counters of the ethN interfaces from the output of OVS_DUMP_PORTS (ports listed by
+      openflow number or by name, counters not supported by the datapath ("?") are 0)
+
+      :return: {N: {counter: value}}
+      :rtype: dict[int, dict[str, int]]
+      """
+      table, _, dumps = output.partition(OFPORTS_END)
+      names = {str(ofport): name for name, ofport in json.loads(table).get("data", []) if isinstance(name, str)}
+      counters = {}
+      for match in DUMP_PORT.finditer(dumps):
+            name = names.get(match.group("port"), match.group("port"))
+            if not name.startswith("eth") or not name[3:].isdigit():
+                  continue
+            counters[int(name[3:])] = {key: int(value) if value.isdigit() else 0 for key, value in match.groupdict().items() if key in COUNTERS}
+      return counters
+
+
+class PortCounterCollector:
+      """samples the port counters of every switch of a deployment in a background thread"""
+
+      def __init__(self, manifest:Manifest, nodes:list[tuple[NodeRecord, Container]], interval:float = 1.0,
+                   bandwidth_mbps:float|None = None) -> None:
+            """basic init
+
+            :param manifest: manifest of the deployment
+            :type manifest: Manifest
+            :param nodes: nodes of the deployment with their container (only the switches are read)
+            :type nodes: list[tuple[NodeRecord, Container]]
+            :param interval: seconds between two samples
+            :type interval: float
+            :param bandwidth_mbps: shaped bandwidth of the links for the utilization, defaults to None
+            :type bandwidth_mbps: float | None, optional
+            """
+            self.manifest = manifest
+            self.switches = [(node, container) for node, container in nodes if node.is_switch]
+            self.interval = interval
+            self.bandwidth_mbps = bandwidth_mbps
+            self.stop_event = threading.Event()
+            self.thread:threading.Thread|None = None
+            self.pool = ThreadPoolExecutor(max_workers=max(1, min(MAX_WORKERS, len(self.switches))))
+            # previous sample and series per (switch row, port)
+            self.previous:dict[tuple[int, int], tuple[float, dict]] = {}
+            self.series:dict[tuple[int, int], list[dict]] = {}
+
+      def read_switch(self, node:NodeRecord, container:Container) -> tuple[NodeRecord, float, dict]:
+            result = container.exec_run(OVS_DUMP_PORTS, user="root")
+            now = time.time()
+            if result.exit_code != 0:
+                  return node, now, {}
+            return node, now, parse_ovs_dump_ports(result.output.decode(errors="ignore"))
+
+      def add_sample(self, node:NodeRecord, now:float, counters:dict[int, dict[str, int]]):
+            for port, values in counters.items():
+                  if self.manifest.link_on_port(node, port) is None:
+                        continue
+                  previous = self.previous.get((node.row, port))
+                  self.previous[(node.row, port)] = (now, values)
+                  if previous is None or now <= previous[0]:
+                        continue
+                  elapsed = now - previous[0]
+                  delta = {key: max(values[key] - previous[1][key], 0) for key in COUNTERS}
+                  point = {
+                        "t": int(now * 1000),
+                        "rx_mbps": delta["rx_bytes"] * 8 / elapsed / 1e6,
+                        "tx_mbps": delta["tx_bytes"] * 8 / elapsed / 1e6,
+                        **{key: delta[key] for key in COUNTERS if not key.endswith("bytes")},
+                  }
+                  if self.bandwidth_mbps:
+                        point["utilization"] = max(point["rx_mbps"], point["tx_mbps"]) / self.bandwidth_mbps
+                  self.series.setdefault((node.row, port), []).append(point)
+
+      def sample(self):
+            """reads all the switches concurrently"""
+            futures = [self.pool.submit(self.read_switch, node, container) for node, container in self.switches]
+            for future in futures:
+                  try:
+                        self.add_sample(*future.result())
+                  except Exception as e:
+                        print(f"  ⚠️ Port counters sample failed: {e}")
+
+      def run(self):
+            next_tick = time.monotonic()
+            while not self.stop_event.is_set():
+                  self.sample()
+                  next_tick += self.interval
+                  self.stop_event.wait(max(next_tick - time.monotonic(), 0))
+            self.sample()
+
+      def start(self):
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+            print(f"🔢 Port counters of {len(self.switches)} switches every {self.interval}s")
+
+      def report(self) -> list[dict]:
+            """series per link, one per switch end (rx/tx as seen from that switch port)"""
+            report = []
+            for (row, port), points in self.series.items():
+                  link = self.manifest.link_on_port(self.manifest.nodes[row], port)
+                  report.append({
+                        "link": self.manifest.link_name(link),
+                        "link_id": link.link_id,
+                        "switch": self.manifest.nodes[row].name,
+                        "port": port,
+                        "peak_mbps": max(max(p["rx_mbps"], p["tx_mbps"]) for p in points),
+                        "dropped": sum(p["rx_dropped"] + p["tx_dropped"] for p in points),
+                        "series": points,
+                  })
+            return sorted(report, key=lambda entry: (entry["link"], entry["switch"]))
+
+      def stop(self, dest_dir:str = ""):
+            """stops the sampling and stores the series in dest_dir/port_counters.json"""
+            self.stop_event.set()
+            if self.thread is not None:
+                  self.thread.join()
+            self.pool.shutdown()
+            report = self.report()
+            if dest_dir:
+                  with open(os.path.join(dest_dir, PORT_COUNTERS_FILE), "w") as f:
+                        json.dump({"interval": self.interval, "bandwidth_mbps": self.bandwidth_mbps, "links": report}, f)
+            busiest = sorted(report, key=lambda entry: -entry["peak_mbps"])[:3]
+            for entry in busiest:
+                  print(f"  🔥 {entry['link']} at {entry['switch']} : peak {entry['peak_mbps']:.1f} Mbps, {entry['dropped']} drops")
@@ -1,17 +1,21 @@
 from gns3fy import Gns3Connector, Project
 
+from generator.state import ProjectState
+
 """File to get all the project info in detail (list of nodes, type, statue, project ID, path, ...)"""
 
 def get_project_info():
       # 1️⃣ Connect to your GNS3 server
       gns3_server = Gns3Connector("http://localhost:3080")
 
-      # 2️⃣ Get your project by name (or use project_id)
+      # 2️⃣ Get your project by name (or use project_id), nodes come from the state mirror
       project = Project(name="test2", connector=gns3_server)
-      project.get()  # fetch project data from the server
+      project.get(get_links=False, get_nodes=False, get_stats=False)
 
-      # 3️⃣ Load all nodes in this project
-      project.get_nodes()
+      # 3️⃣ Load all nodes and links in this project at once
+      with ProjectState(project.project_id) as state:
+            nodes = list(state.nodes.values())
+            nb_links = len(state.links)
 
       # 4️⃣ Inspect general project info
       print("=== PROJECT INFO ===")
@@ -19,25 +23,23 @@ def get_project_info():
       print(f"Project ID:   {project.project_id}")
       print(f"Path:         {project.path}")
       print(f"Status:       {project.status}")
+      print(f"Links:        {nb_links}")
 
-      # 5️⃣ Iterate through all nodes
+      # 5️⃣ Iterate through all nodes (already detailed, no fetch per node)
       print("\n=== NODE DETAILS ===")
-      for node in project.nodes:
-            node.get()  # fetch detailed info for each node
-            print(f"\nNode Name: {node.name}")
-            print(f"  Node ID: {node.node_id}")
-            print(f"  Type: {node.node_type}")
-            print(f"  Template: {node.template}")
-            print(f"  Status: {node.status}")
-            print(f"  Compute ID: {node.compute_id}")
-            print(f"  Console: {node.console_type} on {node.console_host}:{node.console}")
-            print(f"  Coordinates: ({node.x}, {node.y})")
-            print(f"  Locked: {node.locked}")
-            print(f"  Ports: {node.ports}")
-            print(f"  Properties: {node.properties}")
-            print(f"  Template ID: {node.template_id}")
-            print(f"  Node Directory: {node.node_directory}")
-
+      for node in nodes:
+            print(f"\nNode Name: {node.get('name')}")
+            print(f"  Node ID: {node.get('node_id')}")
+            print(f"  Type: {node.get('node_type')}")
+            print(f"  Template ID: {node.get('template_id')}")
+            print(f"  Status: {node.get('status')}")
+            print(f"  Compute ID: {node.get('compute_id')}")
+            print(f"  Console: {node.get('console_type')} on {node.get('console_host')}:{node.get('console')}")
+            print(f"  Coordinates: ({node.get('x')}, {node.get('y')})")
+            print(f"  Locked: {node.get('locked')}")
+            print(f"  Ports: {node.get('ports')}")
+            print(f"  Properties: {node.get('properties')}")
+            print(f"  Node Directory: {node.get('node_directory')}")
 
 if __name__ == "__main__":
       get_project_info()
\ No newline at end of file
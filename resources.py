@@ -0,0 +1,169 @@
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+from docker.models.containers import Container
+
+from generator.manifest import Manifest, NodeRecord
+
+
+"""
+CPU pinning and resource limits of the containers of a deployment. The limits per role come
+from the intent :
+      "resources": {
+            "reserved_cores": 1,                      cores left to the host (gns3, docker, this script)
+            "switch_cores": 2,                        cores shared by all the Open vSwitch containers
+            "switch": {"cpus": 1.0, "mem_mb": 512},
+            "pc": {"cpus": 0.5, "mem_mb": 256}
+      }
+The remaining cores are given to the pcs in round robin on their NODE_IDX so each core gets
+the same number of pcs. The placement is stored with the results (placement.json).
+
+The gns3 server and docker daemons can be confined to the reserved cores too (confine_host_services),
+so that the containers they create or delete meanwhile do not run on the cores of the deployment.
+"""
+
+PLACEMENT_FILE = "placement.json"
+CPU_PERIOD = 100000
+HOST_SERVICES = ["gns3server", "dockerd", "containerd"]
+
+
+def reserved_cores(resources:dict, nb_cpus:int|None = None) -> set[int]:
+      """cores left to the host (the others go to the deployment)"""
+      nb_cpus = nb_cpus or os.cpu_count() or 1
+      return set(range(min(resources.get("reserved_cores", 1), nb_cpus - 1)))
+
+
+def service_pids(names:list[str] = HOST_SERVICES) -> list[int]:
+      """pids of the running processes named in names"""
+      pids = []
+      for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                  continue
+            try:
+                  with open(f"/proc/{entry}/comm", "r") as f:
+                        if f.read().strip() in names:
+                              pids.append(int(entry))
+            except OSError:
+                  pass
+      return pids
+
+
+def confine_host_services(resources:dict) -> dict[int, set[int]]:
+      """pins every thread of the gns3 server and of the docker daemons on the reserved cores (needs
+      root), the processes they start afterwards (containers, ubridge) inherit it : to be called
+      once the nodes of the run are started and pinned
+
+      :param resources: "resources" entry of the intent
+      :type resources: dict
+      :return: previous affinity of each thread pinned, empty when nothing could be pinned
+      :rtype: dict[int, set[int]]
+      """
+      cores = reserved_cores(resources)
+      previous = {}
+      if not cores:
+            print("  ⚠️ No reserved core to confine gns3/docker to")
+            return previous
+      for pid in service_pids():
+            try:
+                  threads = [int(tid) for tid in os.listdir(f"/proc/{pid}/task")]
+            except OSError:
+                  continue
+            for tid in threads:
+                  try:
+                        affinity = os.sched_getaffinity(tid)
+                        os.sched_setaffinity(tid, cores)
+                        previous[tid] = affinity
+                  except OSError:
+                        pass
+      if previous:
+            print(f"  ✅ {len(previous)} gns3/docker threads confined to cores {sorted(cores)}")
+      else:
+            print("  ⚠️ gns3/docker could not be confined to the reserved cores")
+      return previous
+
+
+def restore_affinity(previous:dict[int, set[int]]):
+      for tid, affinity in previous.items():
+            try:
+                  os.sched_setaffinity(tid, affinity)
+            except OSError:
+                  pass
+
+
+def plan_cpusets(manifest:Manifest, resources:dict, nb_cpus:int|None = None) -> dict[str, dict]:
+      """computes the cpuset and the limits of each node of the deployment
+
+      :param manifest: manifest of the deployment
+      :type manifest: Manifest
+      :param resources: "resources" entry of the intent
+      :type resources: dict
+      :param nb_cpus: number of cpus of the host, defaults to os.cpu_count()
+      :type nb_cpus: int | None, optional
+      :return: {node name: {"cpuset", "cpus", "mem_mb"}}
+      :rtype: dict[str, dict]
+      """
+      nb_cpus = nb_cpus or os.cpu_count() or 1
+      cores = list(range(nb_cpus))[len(reserved_cores(resources, nb_cpus)):]
+      nb_switch_cores = min(resources.get("switch_cores", max(1, len(cores) // 8)), len(cores) - 1)
+      # when the host is too small, switches and pcs share the same cores
+      switch_cores = cores[:nb_switch_cores] if nb_switch_cores > 0 else cores
+      pc_cores = cores[nb_switch_cores:] if nb_switch_cores > 0 else cores
+
+      placement = {}
+      for node in manifest.nodes:
+            role = "switch" if node.is_switch else "pc"
+            limits = resources.get(role, {})
+            cpuset = ",".join(map(str, switch_cores)) if node.is_switch else str(pc_cores[node.index % len(pc_cores)])
+            placement[node.name] = {
+                  "cpuset": cpuset,
+                  "cpus": limits.get("cpus"),
+                  "mem_mb": limits.get("mem_mb"),
+            }
+      return placement
+
+
+def update_container(container:Container, limits:dict):
+      """applies the cpuset and the limits of one container"""
+      kwargs = {"cpuset_cpus": limits["cpuset"]}
+      if limits["cpus"]:
+            kwargs["cpu_period"] = CPU_PERIOD
+            kwargs["cpu_quota"] = int(limits["cpus"] * CPU_PERIOD)
+      if limits["mem_mb"]:
+            kwargs["mem_limit"] = f"{limits['mem_mb']}m"
+            kwargs["memswap_limit"] = f"{limits['mem_mb']}m"
+      container.update(**kwargs)
+
+
+def apply_resources(manifest:Manifest, nodes:list[tuple[NodeRecord, Container]], resources:dict, dest_dir:str = "") -> dict[str, dict]:
+      """pins and limits all the containers of the deployment in parallel, then records the
+      placement in dest_dir/placement.json
+
+      :param manifest: manifest of the deployment
+      :type manifest: Manifest
+      :param nodes: running nodes of the deployment with their container
+      :type nodes: list[tuple[NodeRecord, Container]]
+      :param resources: "resources" entry of the intent
+      :type resources: dict
+      :param dest_dir: directory of the results, defaults to "" (placement not recorded)
+      :type dest_dir: str, optional
+      :return: the placement applied
+      :rtype: dict[str, dict]
+      """
+      placement = plan_cpusets(manifest, resources)
+      print(f"→ Pinning {len(nodes)} containers on {os.cpu_count()} cpus")
+
+      def apply(item:tuple[NodeRecord, Container]):
+            node, container = item
+            try:
+                  update_container(container, placement[node.name])
+            except Exception as e:
+                  print(f"  ⚠️ Failed to pin {container.name}: {e}")
+
+      with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(apply, nodes))
+
+      if dest_dir:
+            with open(os.path.join(dest_dir, PLACEMENT_FILE), "w") as f:
+                  json.dump({"host_cpus": os.cpu_count(), "resources": resources, "nodes": placement}, f, indent=6)
+      print("  ✅ Containers pinned")
+      return placement
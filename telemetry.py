@@ -0,0 +1,176 @@
+import os
+import struct
+import threading
+import time
+from docker.models.containers import Container
+
+from generator.manifest import Manifest
+
+
+"""
+Live resource telemetry of a deployment during a gossip run : cpu and memory from the docker
+stats stream of every container, rx/tx per interface read from the network namespace of the
+container (/proc/<pid>/net/dev, no docker exec needed). Opt-in from the intent :
+      "telemetry_interval": 0.5
+The interval is the period of the records and of the /proc net reads only : docker refreshes the
+cpu and memory of its stats stream every second, a shorter interval repeats the last values.
+
+Everything is written in a compact time series file next to the logs :
+      - header    : magic, version, sampling interval
+      - records   : timestamp, node row in the manifest, cpu %, memory bytes, interface, rx bytes, tx bytes
+"""
+
+TELEMETRY_FILE = "telemetry.bin"
+MAGIC = b"GSTS"
+VERSION = 1
+NO_INTERFACE = 255
+
+HEADER = struct.Struct("<4sHd")
+# timestamp, node row, cpu %, memory, interface (ethN -> N), rx bytes, tx bytes
+RECORD = struct.Struct("<dIfQBQQ")
+
+
+def cpu_percent(stats:dict) -> float:
+      """cpu usage of a docker stats sample (same computation as `docker stats`)"""
+      cpu, precpu = stats.get("cpu_stats", {}), stats.get("precpu_stats", {})
+      cpu_delta = cpu.get("cpu_usage", {}).get("total_usage", 0) - precpu.get("cpu_usage", {}).get("total_usage", 0)
+      system_delta = cpu.get("system_cpu_usage", 0) - precpu.get("system_cpu_usage", 0)
+      if cpu_delta <= 0 or system_delta <= 0:
+            return 0.0
+      return cpu_delta / system_delta * cpu.get("online_cpus", 1) * 100
+
+
+def memory_bytes(stats:dict) -> int:
+      """memory usage of a docker stats sample without the page cache"""
+      memory = stats.get("memory_stats", {})
+      cache = memory.get("stats", {}).get("inactive_file", memory.get("stats", {}).get("cache", 0))
+      return max(memory.get("usage", 0) - cache, 0)
+
+
+def read_net_dev(pid:int) -> dict[int, tuple[int, int]]:
+      """reads the interface counters of the network namespace of a process
+
+      :return: {N: (rx bytes, tx bytes)} for each ethN interface (vlans such as eth0.100 and N
+               beyond the interface field of a record are skipped)
+      :rtype: dict[int, tuple[int, int]]
+      """
+      counters = {}
+      with open(f"/proc/{pid}/net/dev", "r") as f:
+            for line in f.readlines()[2:]:
+                  name, values = line.split(":", 1)
+                  name = name.strip()
+                  if not name.startswith("eth") or not name[3:].isdigit() or int(name[3:]) >= NO_INTERFACE:
+                        continue
+                  values = values.split()
+                  counters[int(name[3:])] = (int(values[0]), int(values[8]))
+      return counters
+
+
+class TelemetrySampler:
+      """samples all the containers of a deployment concurrently and streams the records in
+      dest_dir/telemetry.bin, can be used as a context manager around the gossip run"""
+
+      def __init__(self, manifest:Manifest, containers:list[Container], dest_dir:str, interval:float = 1.0) -> None:
+            """basic init
+
+            :param manifest: manifest of the deployment
+            :type manifest: Manifest
+            :param containers: running containers of the deployment
+            :type containers: list[Container]
+            :param dest_dir: directory of the results
+            :type dest_dir: str
+            :param interval: seconds between two samples, cpu and memory are refreshed by docker every second
+            :type interval: float
+            """
+            self.manifest = manifest
+            self.containers = containers
+            self.path = os.path.join(dest_dir, TELEMETRY_FILE)
+            self.interval = interval
+            self.stop_event = threading.Event()
+            self.threads:list[threading.Thread] = []
+            # latest (cpu, memory) per node row, updated by the stats streams
+            self.latest:dict[int, tuple[float, int]] = {}
+            self.pids:dict[int, int] = {}
+
+      def follow_stats(self, row:int, container:Container):
+            """consumes the docker stats stream of one container"""
+            try:
+                  for stats in container.stats(stream=True, decode=True):
+                        self.latest[row] = (cpu_percent(stats), memory_bytes(stats))
+                        if self.stop_event.is_set():
+                              return
+            except Exception as e:
+                  print(f"  ⚠️ Telemetry stream of {container.name} stopped: {e}")
+
+      def sample(self, f):
+            """writes one record per interface of each container"""
+            now = time.time()
+            records = bytearray()
+            for row, pid in self.pids.items():
+                  cpu, memory = self.latest.get(row, (0.0, 0))
+                  try:
+                        counters = read_net_dev(pid)
+                  except OSError:
+                        counters = {}
+                  if not counters:
+                        records += RECORD.pack(now, row, cpu, memory, NO_INTERFACE, 0, 0)
+                  for interface, (rx, tx) in counters.items():
+                        records += RECORD.pack(now, row, cpu, memory, interface, rx, tx)
+            f.write(records)
+
+      def run(self):
+            try:
+                  with open(self.path, "wb") as f:
+                        f.write(HEADER.pack(MAGIC, VERSION, self.interval))
+                        next_tick = time.monotonic()
+                        while not self.stop_event.is_set():
+                              self.sample(f)
+                              next_tick += self.interval
+                              self.stop_event.wait(max(next_tick - time.monotonic(), 0))
+                        self.sample(f)
+            except Exception as e:
+                  print(f"  ⚠️ Telemetry writer stopped, {self.path} ends there: {e}")
+
+      def start(self):
+            for container in self.containers:
+                  node = self.manifest.by_container_id.get(container.id)
+                  if node is None:
+                        continue
+                  self.pids[node.row] = container.attrs["State"]["Pid"]
+                  self.threads.append(threading.Thread(target=self.follow_stats, args=(node.row, container), daemon=True))
+            self.threads.append(threading.Thread(target=self.run, daemon=True))
+            for thread in self.threads:
+                  thread.start()
+            print(f"📈 Telemetry on {len(self.pids)} containers every {self.interval}s → {self.path}")
+
+      def stop(self):
+            self.stop_event.set()
+            # the stats streams end on their next sample, only the writer has to be waited for
+            self.threads[-1].join()
+
+      def __enter__(self):
+            self.start()
+            return self
+
+      def __exit__(self, *_):
+            self.stop()
+
+
+def read_telemetry(path:str) -> dict[int, list[tuple]]:
+      """reads a telemetry file
+
+      :param path: path of the telemetry file
+      :type path: str
+      :return: {node row: [(timestamp, cpu, memory, interface, rx, tx), ...]}
+      :rtype: dict[int, list[tuple]]
+      """
+      with open(path, "rb") as f:
+            data = f.read()
+      magic, version, _ = HEADER.unpack_from(data)
+      if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a telemetry file (version {VERSION})")
+      series:dict[int, list[tuple]] = {}
+      end = HEADER.size + (len(data) - HEADER.size) // RECORD.size * RECORD.size
+      for timestamp, row, cpu, memory, interface, rx, tx in RECORD.iter_unpack(data[HEADER.size:end]):
+            series.setdefault(row, []).append((timestamp, cpu, memory, interface, rx, tx))
+      return series
@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import requests
+
+from generator import Manifest, TopologyPlan
+from generator.project_generator import ENVIRONMENT_KEYS, docker_environment
+from generator.state import GNS3_URL
+
+
+"""
+Cache of built topologies : after the first build of a topology, the gns3 project is exported as
+a portable project next to its manifest, keyed by a hash of the topology plan (mesh, sizes,
+templates, ip range, computes). The next runs of the same topology import it back in a single
+call instead of creating every node and link again, then only the environment of the pcs is
+updated if the protocol or the block settings differ. The cache is bounded in size on disk and
+the least recently used topologies are evicted first.
+"""
+
+TOPOLOGY_CACHE_DIR = os.path.expanduser("~/.cache/gossip_topologies")
+TOPOLOGY_CACHE_MAX_BYTES = 5 * 1024**3
+# keys of the intent that change the topology itself (the others only change the environment)
+TOPOLOGY_KEYS = ["Open vSwitch", "gossiptcpudp", "ip_range", "computes", "link_filter"]
+
+
+def topology_key(mesh, data:dict) -> str:
+      plan = {key: data.get(key) for key in TOPOLOGY_KEYS}
+      plan["mesh"] = getattr(mesh, "value", mesh)
+      return hashlib.sha256(json.dumps(plan, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class TopologyCache:
+      """LRU cache of exported gns3 projects"""
+
+      def __init__(self, cache_dir:str = TOPOLOGY_CACHE_DIR, max_bytes:int = TOPOLOGY_CACHE_MAX_BYTES, url:str = GNS3_URL) -> None:
+            self.cache_dir = cache_dir
+            self.max_bytes = max_bytes
+            self.url = f"{url}/v2"
+            os.makedirs(cache_dir, exist_ok=True)
+            self.index_path = os.path.join(cache_dir, "index.json")
+            self.index = {}
+            if os.path.exists(self.index_path):
+                  with open(self.index_path, "r") as f:
+                        self.index = json.load(f)
+
+      def paths(self, key:str) -> tuple[str, str]:
+            return os.path.join(self.cache_dir, f"{key}.gns3project"), os.path.join(self.cache_dir, f"{key}.manifest")
+
+      def save_index(self):
+            with open(self.index_path, "w") as f:
+                  json.dump(self.index, f, indent=6)
+
+      def evict(self):
+            """removes the least recently used topologies until the cache fits in max_bytes"""
+            total = sum(entry["size"] for entry in self.index.values())
+            for key in sorted(self.index, key=lambda k: self.index[k]["last_used"]):
+                  if total <= self.max_bytes:
+                        break
+                  for path in self.paths(key):
+                        if os.path.exists(path):
+                              os.remove(path)
+                  total -= self.index.pop(key)["size"]
+                  print(f"  🗑 Evicted topology {key} from the cache")
+            self.save_index()
+
+      def store(self, manifest:Manifest, mesh, data:dict):
+            """exports the project of a freshly built topology in the cache"""
+            key = topology_key(mesh, data)
+            project_path, manifest_path = self.paths(key)
+            url = f"{self.url}/projects/{manifest.meta['project_id']}/export"
+            with requests.get(url, params={"include_images": "no"}, stream=True) as response:
+                  response.raise_for_status()
+                  with open(project_path, "wb") as f:
+                        for chunk in response.iter_content(1024 * 1024):
+                              f.write(chunk)
+            manifest.dump(manifest_path)
+            self.index[key] = {
+                  "size": os.path.getsize(project_path) + os.path.getsize(manifest_path),
+                  "last_used": time.time(),
+                  "mesh": getattr(mesh, "value", mesh),
+            }
+            print(f"  ✅ Topology {key} stored in the cache")
+            self.evict()
+
+      def delete_project(self, name:str):
+            for project in requests.get(f"{self.url}/projects").json():
+                  if project["name"] == name:
+                        requests.post(f"{self.url}/projects/{project['project_id']}/close")
+                        requests.delete(f"{self.url}/projects/{project['project_id']}").raise_for_status()
+
+      def restore(self, name:str, mesh, data:dict) -> Manifest | None:
+            """imports a cached topology as project `name` (replacing it)
+
+            :return: the manifest of the restored deployment, None if the topology is not cached
+            :rtype: Manifest | None
+            """
+            key = topology_key(mesh, data)
+            project_path, manifest_path = self.paths(key)
+            if key not in self.index or not os.path.exists(project_path):
+                  return None
+            cached = Manifest.load(manifest_path)
+
+            self.delete_project(name)
+            project_id = str(uuid.uuid4())
+            with open(project_path, "rb") as f:
+                  requests.post(f"{self.url}/projects/{project_id}/import", params={"name": name}, data=f).raise_for_status()
+            requests.post(f"{self.url}/projects/{project_id}/open").raise_for_status()
+
+            if any(cached.meta["intent"].get(k) != data.get(k) for k in ENVIRONMENT_KEYS):
+                  self.update_environment(project_id, cached, data)
+            manifest = self.remap(project_id, cached, data)
+            self.index[key]["last_used"] = time.time()
+            self.save_index()
+            print(f"♻️ Topology {key} restored from the cache in {name}")
+            return manifest
+
+      def update_environment(self, project_id:str, cached:Manifest, data:dict):
+            """sets the environment of every pc for the settings of the new intent"""
+            nodes = {node["name"]: node for node in requests.get(f"{self.url}/projects/{project_id}/nodes").json()}
+            neighbors = ",".join(pc.ip for pc in sorted(cached.pcs(), key=lambda pc: pc.index))
+            for pc in cached.pcs():
+                  requests.put(f"{self.url}/projects/{project_id}/nodes/{nodes[pc.name]['node_id']}", json={
+                        "properties": {"environment": docker_environment(data, pc.index, neighbors)}
+                  }).raise_for_status()
+
+      def remap(self, project_id:str, cached:Manifest, data:dict) -> Manifest:
+            """manifest of the imported project : same topology with the new ids"""
+            nodes = {node["name"]: node for node in requests.get(f"{self.url}/projects/{project_id}/nodes").json()}
+            names = {node["node_id"]: name for name, node in nodes.items()}
+            link_ids = {}
+            for link in requests.get(f"{self.url}/projects/{project_id}/links").json():
+                  ends = tuple(sorted((names[end["node_id"]], end["adapter_number"]) for end in link["nodes"]))
+                  link_ids[ends] = link["link_id"]
+
+            manifest = Manifest({**cached.meta, "project_id": project_id, "intent": data})
+            for node in cached.nodes:
+                  new = nodes[node.name]
+                  manifest.add_node(
+                        node.role, node.index, node.name, new["node_id"],
+                        switch=cached.nodes[node.switch].name if not node.is_switch else None,
+                        ip=node.ip, port=node.port,
+                        container_id=(new.get("properties") or {}).get("container_id", ""),
+                        compute_id=new.get("compute_id", ""),
+                  )
+            for link in cached.links:
+                  a, b = cached.nodes[link.a].name, cached.nodes[link.b].name
+                  ends = tuple(sorted(((a, link.port_a), (b, link.port_b))))
+                  manifest.add_link(link_ids.get(ends, link.link_id), a, link.port_a, b, link.port_b, link.filters)
+            manifest.meta["plan"] = TopologyPlan(manifest, data).to_dict()
+            return manifest